@@ -0,0 +1,106 @@
+"""
+Контроль допуску до дорогих шляхів обробки: розпізнавання голосу (voice) і парсингу через Gemini (llm).
+
+Для кожного шляху діють два обмеження:
+- token bucket на користувача: rate дозволів за хвилину із запасом burst
+- глобальна кількість одночасних запитів (max_in_flight)
+
+Перевантаження не накопичується в чергах: голосове повідомлення відхиляється з підказкою надіслати
+вправу текстом, а парсинг без дозволу на Gemini виконується лише локально. Кожна відмова рахується
+в метриці admission_shed{path, reason}. Значення 0 вимикає відповідне обмеження
+"""
+import contextvars
+import time
+
+import metrics
+from cache import LRUCache
+from config import (VOICE_USER_RATE, VOICE_USER_BURST, VOICE_MAX_IN_FLIGHT, LLM_USER_RATE, LLM_USER_BURST,
+                    LLM_MAX_IN_FLIGHT, ADMISSION_USERS_CACHE_SIZE)
+
+VOICE_OVERLOADED = ("Зараз бот обробляє забагато голосових повідомлень.\n"
+                    "Надішліть вправу текстом або спробуйте голосом за хвилину.")
+VOICE_TOO_FREQUENT = ("Ви надсилаєте голосові повідомлення занадто часто.\n"
+                      "Зачекайте трохи або надішліть вправу текстом.")
+
+# id користувача, чиє оновлення обробляється (задає middleware)
+_current_user = contextvars.ContextVar("admission_user", default=None)
+
+
+class TokenBucket:
+    """rate дозволів за хвилину, не більше burst поспіль"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate / 60
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Limiter:
+    """Обмеження одного шляху: token bucket кожного користувача і глобальна кількість одночасних запитів"""
+
+    def __init__(self, path, rate, burst, max_in_flight, users_cache_size=ADMISSION_USERS_CACHE_SIZE):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._buckets = LRUCache(users_cache_size)
+
+    def _shed(self, reason):
+        metrics.incr(metrics.labeled("admission_shed", path=self.path, reason=reason))
+        return reason
+
+    def try_acquire(self, user_id):
+        """Займає слот і повертає None або повертає причину відмови: overload чи user_rate"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return self._shed("overload")
+        if self.rate and user_id is not None:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, max(1, self.burst))
+                self._buckets.put(user_id, bucket)
+            if not bucket.take():
+                return self._shed("user_rate")
+        self.in_flight += 1
+        metrics.set_gauge(metrics.labeled("admission_in_flight", path=self.path), self.in_flight)
+        metrics.incr(metrics.labeled("admission_admitted", path=self.path))
+        return None
+
+    def release(self):
+        self.in_flight -= 1
+        metrics.set_gauge(metrics.labeled("admission_in_flight", path=self.path), self.in_flight)
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight, "users": len(self._buckets)}
+
+
+voice = Limiter("voice", VOICE_USER_RATE, VOICE_USER_BURST, VOICE_MAX_IN_FLIGHT)
+llm = Limiter("llm", LLM_USER_RATE, LLM_USER_BURST, LLM_MAX_IN_FLIGHT)
+
+
+def try_acquire_llm():
+    """Дозвіл на звернення до Gemini для поточного користувача; після запиту — llm.release()"""
+    return llm.try_acquire(_current_user.get()) is None
+
+
+async def admission_middleware(handler, event, data):
+    """
+    Внутрішній middleware повідомлень: запам'ятовує автора для обмеження llm. Обмеження voice
+    перевіряє сам process_voice_message після перевірки стану тренування: повідомлення, які
+    не дійдуть до розпізнавання, не витрачають ліміт
+    """
+    token = _current_user.set(event.from_user.id if event.from_user else None)
+    try:
+        return await handler(event, data)
+    finally:
+        _current_user.reset(token)
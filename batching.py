@@ -0,0 +1,81 @@
+import asyncio
+
+import metrics
+
+
+class MicroBatcher:
+    """
+    Збирає елементи, що надійшли протягом короткого вікна (або до max_size), і передає їх
+    одним викликом handler(items) -> список результатів у тому ж порядку.
+    Кожен submit отримує свій результат; виняток на місці результату дістається лише своєму елементу,
+    а помилка всього обробника передається всім елементам пакета
+    """
+
+    def __init__(self, handler, window, max_size, name="batch"):
+        self.handler = handler
+        self.window = window
+        self.max_size = max_size
+        self.name = name
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self._draining = False
+
+    async def submit(self, item):
+        if self._draining:
+            raise RuntimeError(f"Пакетувальник {self.name} зупиняється, нові елементи не приймаються")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        metrics.incr(f"{self.name}_batches")
+        metrics.incr(f"{self.name}_batched_items", len(batch))
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def drain(self):
+        """Перестає приймати елементи, відправляє поточний пакет і дочікується всіх пакетів, що обробляються"""
+        self._draining = True
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        batches = metrics.counter(f"{self.name}_batches")
+        items = metrics.counter(f"{self.name}_batched_items")
+        return {
+            "batches": batches,
+            "items": items,
+            "avg_size": round(items / batches, 2) if batches else 0.0,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,80 @@
+"""
+Порівняння підготовки голосового повідомлення до розпізнавання: попередній шлях через тимчасові
+файли (OGG на диск → pydub → WAV на диск → sr.AudioFile) і шлях у пам'яті (байти → ffmpeg → PCM).
+
+    python -m benchmarks.audio_bench voice1.ogg voice2.ogg [--repeat 10]
+
+Без аргументів генерує синтетичні OGG/Opus-файли потрібної тривалості через ffmpeg.
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+import speech_recognition as sr
+from pydub import AudioSegment
+
+from config import FFMPEG_BINARY
+from voice_pool import decode_ogg
+
+
+def make_sample(seconds):
+    command = [FFMPEG_BINARY, "-nostdin", "-loglevel", "error", "-f", "lavfi",
+               "-i", f"sine=frequency=440:duration={seconds}", "-ac", "1", "-c:a", "libopus", "-f", "ogg", "pipe:1"]
+    return subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout
+
+
+def via_temp_files(data):
+    """Попередня реалізація: завантаження у файл, конвертація у WAV-файл і читання його назад"""
+    temp_path = os.path.join(tempfile.gettempdir(), f"voice_bench_{os.getpid()}.ogg")
+    wav_path = temp_path.replace('.ogg', '.wav')
+    try:
+        with open(temp_path, 'wb') as f:
+            for i in range(0, len(data), 1024):
+                f.write(data[i:i + 1024])
+        audio = AudioSegment.from_ogg(temp_path)
+        audio.export(wav_path, format="wav")
+        with sr.AudioFile(wav_path) as source:
+            return sr.Recognizer().record(source)
+    finally:
+        for path in (temp_path, wav_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def in_memory(data):
+    return sr.AudioData(*decode_ogg(data))
+
+
+def measure(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main(args):
+    if args.files:
+        samples = []
+        for path in args.files:
+            with open(path, 'rb') as f:
+                samples.append((os.path.basename(path), f.read()))
+    else:
+        samples = [(f"синтетичний {seconds} с", make_sample(seconds)) for seconds in (3, 10, 30)]
+
+    print(f"{'файл':24} {'розмір':>9} {'файли, мс':>10} {'пам`ять, мс':>12} {'приріст':>8}")
+    for name, data in samples:
+        before = measure(via_temp_files, data, args.repeat)
+        after = measure(in_memory, data, args.repeat)
+        print(f"{name:24} {len(data):9} {before:10.1f} {after:12.1f} {before / after:7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--repeat", type=int, default=10)
+    main(parser.parse_args())
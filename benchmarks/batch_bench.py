@@ -0,0 +1,71 @@
+"""
+Пропускна здатність парсингу через Gemini з пакетуванням і без нього на локальній FakeGeminiModel.
+
+Рахуються лише повідомлення, що отримали результат. Очікування вільного слота (GEMINI_QUEUE_TIMEOUT)
+на час вимірювання збільшується до --queue-timeout, щоб варіант без пакетування не відкидав
+більшість запитів і не виглядав швидшим за рахунок відмов.
+
+    python -m benchmarks.batch_bench [--messages 200] [--latency 0.3] [--window-ms 100] [--max-size 16]
+                                     [--queue-timeout 60]
+"""
+import argparse
+import asyncio
+import time
+
+import database
+import utils
+from batching import MicroBatcher
+from fakes import FakeGeminiModel
+
+
+def make_messages(count):
+    # Повідомлення з низькою впевненістю локального парсера, щоб кожне доходило до Gemini;
+    # унікальні, щоб не влучати в кеш результатів
+    return [f"присідання {i + 1}" for i in range(count)]
+
+
+async def run(messages, model, batched):
+    utils.GEMINI_BATCH_ENABLED = batched
+    started = time.perf_counter()
+    results = await asyncio.gather(*[utils.request_gemini_parse(model, text) for text in messages])
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for result in results if not result)
+    return elapsed, failed
+
+
+async def main(args):
+    utils.GEMINI_QUEUE_TIMEOUT = args.queue_timeout
+    messages = make_messages(args.messages)
+    print(f"Повідомлень: {len(messages)}, затримка моделі: {args.latency} с, "
+          f"паралельних викликів: {utils.GEMINI_MAX_CONCURRENCY}, тайм-аут: {utils.GEMINI_TIMEOUT} с, "
+          f"очікування слота: {utils.GEMINI_QUEUE_TIMEOUT} с")
+
+    single_model = FakeGeminiModel(latency=args.latency, per_item_latency=args.per_item_latency)
+    single, single_failed = await run(messages, single_model, batched=False)
+
+    batch_model = FakeGeminiModel(latency=args.latency, per_item_latency=args.per_item_latency)
+    utils._batchers[id(batch_model)] = batcher = MicroBatcher(
+        utils.get_batcher(batch_model).handler, args.window_ms / 1000, args.max_size, name="bench")
+    batched, batched_failed = await run(messages, batch_model, batched=True)
+
+    single_rate = (len(messages) - single_failed) / single
+    batched_rate = (len(messages) - batched_failed) / batched
+    print(f"Без пакетування: {single:6.2f} с, {single_rate:7.1f} розпарсених повід./с, "
+          f"викликів: {single_model.calls}, без результату: {single_failed}")
+    print(f"З пакетуванням:  {batched:6.2f} с, {batched_rate:7.1f} розпарсених повід./с, "
+          f"викликів: {batch_model.calls}, без результату: {batched_failed}, пакети: {batcher.stats()}")
+    ratio = f"{batched_rate / single_rate:.1f}x" if single_rate else "—"
+    print(f"Приріст: {ratio} (без результату: {single_failed} без пакетування, {batched_failed} з пакетуванням)")
+    await database.pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--per-item-latency", type=float, default=0.005)
+    parser.add_argument("--window-ms", type=int, default=100)
+    parser.add_argument("--max-size", type=int, default=16)
+    parser.add_argument("--queue-timeout", type=float, default=60.0,
+                        help="очікування вільного слота Gemini на час вимірювання, с")
+    asyncio.run(main(parser.parse_args()))
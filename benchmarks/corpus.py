@@ -0,0 +1,44 @@
+"""Зразки повідомлень користувачів з очікуваним результатом парсингу (None — не вправа)"""
+
+SAMPLE_MESSAGES = [
+    ("Відтискання 20 разів", {"name": "відтискання", "reps": 20, "weight": None}),
+    ("Зробив 20 відтискань", {"name": "відтискання", "reps": 20, "weight": None}),
+    ("15 підтягувань", {"name": "підтягування", "reps": 15, "weight": None}),
+    ("Присідання 30 разів з вагою 20 кг", {"name": "присідання", "reps": 30, "weight": 20}),
+    ("Жим лежачи 12 повторів з вагою 80 кг", {"name": "жим лежачи", "reps": 12, "weight": 80}),
+    ("жим штанги лежачи 10 разів 80 кг", {"name": "жим штанги лежачи", "reps": 10, "weight": 80}),
+    ("жим гантелі лежачи 12 повторів 24 кг", {"name": "жим гантель лежачи", "reps": 12, "weight": 24}),
+    ("французький жим лежачи 12 повторів з вагою 40 кг", {"name": "французький жим лежачи", "reps": 12, "weight": 40}),
+    ("жим стоячи 8 разів 40 кг", {"name": "жим стоячи", "reps": 8, "weight": 40}),
+    ("жим від грудей 10 повторів", {"name": "жим від грудей", "reps": 10, "weight": None}),
+    ("присідання з штангою 15 повторів", {"name": "присідання з штангою", "reps": 15, "weight": None}),
+    ("присідання з гантелями 12 разів 16 кг", {"name": "присідання з гантеллю", "reps": 12, "weight": 16}),
+    ("підтягування широким хватом 8 разів", {"name": "підтягування широким хватом", "reps": 8, "weight": None}),
+    ("підтягування вузьким хватом 10 разів", {"name": "підтягування вузьким хватом", "reps": 10, "weight": None}),
+    ("підтягування зворотним хватом 6 повторів", {"name": "підтягування зворотним хватом", "reps": 6, "weight": None}),
+    ("віджимання від підлоги 25 разів", {"name": "відтискання від підлоги", "reps": 25, "weight": None}),
+    ("відтискання на брусах 12 разів", {"name": "відтискання на брусах", "reps": 12, "weight": None}),
+    ("планка на ліктях 60 разів", {"name": "планка на ліктях", "reps": 60, "weight": None}),
+    ("тяга штанги в нахилі 10 разів 60 кг", {"name": "тяга штанги в нахилі", "reps": 10, "weight": 60}),
+    ("тяга гантелі в нахилі 12 повторів 20 кг", {"name": "тяга гантель в нахилі", "reps": 12, "weight": 20}),
+    ("тяга верхнього блоку 12 разів 50 кг", {"name": "тяга верхнього блоку", "reps": 12, "weight": 50}),
+    ("махи гантелями 15 разів 8 кг", {"name": "махи гантелями", "reps": 15, "weight": 8}),
+    ("розведення гантелі лежачи 12 разів 10 кг", {"name": "розведення гантель лежачи", "reps": 12, "weight": 10}),
+    ("випади з гантелями 20 разів 12 кг", {"name": "випади з гантелями", "reps": 20, "weight": 12}),
+    ("випади 20 разів", {"name": "випади", "reps": 20, "weight": None}),
+    ("скручування 30 разів", {"name": "скручування", "reps": 30, "weight": None}),
+    ("приїде 20 разів", {"name": "присідання", "reps": 20, "weight": None}),
+    ("відтискань я 15", {"name": "відтискання", "reps": 15, "weight": None}),
+    ("підтягуван я 10 разів", {"name": "підтягування", "reps": 10, "weight": None}),
+    ("присідання 25", {"name": "присідання", "reps": 25, "weight": None}),
+    ("жим лежачи 80 кг", None),
+    ("тяга румунська 10 разів 70 кг", {"name": "тяга румунська", "reps": 10, "weight": 70}),
+    ("становий жим 5 разів 100 кг", {"name": "становий жим", "reps": 5, "weight": 100}),
+    ("банан 20 разів", None),
+    ("музика грає", None),
+    ("привіт", None),
+    ("сьогодні 5 км пробіжка", None),
+    ("Відтискання двадцять разів", {"name": "відтискання", "reps": 20, "weight": None}),
+    ("підтягування 12", {"name": "підтягування", "reps": 12, "weight": None}),
+    ("зробив присідання 40 разів", {"name": "присідання", "reps": 40, "weight": None}),
+]
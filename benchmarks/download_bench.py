@@ -0,0 +1,61 @@
+"""
+Завантаження голосових файлів з локального FakeFileServer: нова сесія aiohttp на кожен файл
+(як було раніше, чанки по 1 КБ) проти спільного http_client з пулом з'єднань.
+
+    python -m benchmarks.download_bench [--files 500] [--size 32768] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+import http_client
+import metrics
+from fakes import FakeFileServer
+
+
+async def download_new_session(url):
+    data = bytearray()
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as resp:
+            async for chunk in resp.content.iter_chunked(1024):
+                data += chunk
+    return bytes(data)
+
+
+async def run(download, urls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(url):
+        async with semaphore:
+            return await download(url)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[one(url) for url in urls])
+    return time.perf_counter() - started, sum(len(data) for data in results)
+
+
+async def main(args):
+    server = await FakeFileServer(default_size=args.size).start()
+    urls = [server.file_url.format(token="TEST", file_path=f"voice/file_{i}.oga") for i in range(args.files)]
+    try:
+        before, _ = await run(download_new_session, urls, args.concurrency)
+        await http_client.start()
+        after, _ = await run(http_client.download, urls, args.concurrency)
+    finally:
+        await http_client.close()
+        await server.stop()
+
+    print(f"Файлів: {args.files} по {args.size} байт, паралельно: {args.concurrency}")
+    print(f"Нова сесія на файл: {before:6.2f} с ({args.files / before:7.1f} файлів/с)")
+    print(f"Спільний клієнт:    {after:6.2f} с ({args.files / after:7.1f} файлів/с), {before / after:.1f}x")
+    print(f"Метрики завантаження: {metrics.latency('telegram_download').snapshot()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size", type=int, default=32 * 1024)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
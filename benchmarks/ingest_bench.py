@@ -0,0 +1,92 @@
+"""
+Запис підходів: окремий коміт на кожен рядок проти групових комітів database.entry_batcher.
+
+Обидва варіанти пишуть у тимчасову базу з однаковим режимом fsync (INGEST_SYNCHRONOUS)
+і однаковою кількістю одночасних записувачів; вимірюється кількість записаних підходів за секунду.
+
+    python -m benchmarks.ingest_bench [--rows 2000] [--users 200]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import database
+from batching import MicroBatcher
+from config import INGEST_SYNCHRONOUS, INGEST_WINDOW_MS, INGEST_MAX_BATCH
+from migrations import migrate
+
+
+def prepare(path, users):
+    conn = database.connect(path)
+    migrate(conn)
+    with conn:
+        sessions = [conn.execute("INSERT INTO training_sessions (user_id, started_at) VALUES (?, '2024-01-01')",
+                                 (user_id,)).lastrowid for user_id in range(users)]
+    conn.close()
+    return sessions
+
+
+def make_entries(sessions, rows):
+    names = ["присідання", "віджимання", "підтягування", "жим лежачи", "випади"]
+    return [(i % len(sessions), sessions[i % len(sessions)], None, names[i % len(names)], 10, 20)
+            for i in range(rows)]
+
+
+async def per_row(path, entries):
+    # Як до групування: кожен підхід — окрема транзакція на одному з з'єднань пулу
+    pool = database.ConnectionPool(path, database.DB_POOL_SIZE, synchronous=INGEST_SYNCHRONOUS, name="bench_rows")
+    started = time.perf_counter()
+    await asyncio.gather(*[pool.run(database._add_exercise_entry, *entry) for entry in entries])
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return elapsed
+
+
+async def grouped(path, entries):
+    writer = database.ConnectionPool(path, 1, synchronous=INGEST_SYNCHRONOUS, name="bench_writer")
+
+    async def write(batch):
+        return await writer.run(database._add_exercise_entries, batch)
+
+    batcher = MicroBatcher(write, INGEST_WINDOW_MS / 1000, INGEST_MAX_BATCH, name="bench_ingest")
+    started = time.perf_counter()
+    await asyncio.gather(*[batcher.submit(entry) for entry in entries])
+    elapsed = time.perf_counter() - started
+    await writer.close()
+    return elapsed, batcher.stats()
+
+
+def count_rows(path):
+    conn = database.connect(path)
+    count = conn.execute("SELECT COUNT(*) FROM exercise_entries").fetchone()[0]
+    conn.close()
+    return count
+
+
+async def main(args):
+    print(f"Підходів: {args.rows}, користувачів: {args.users}, synchronous={INGEST_SYNCHRONOUS}, "
+          f"вікно: {INGEST_WINDOW_MS} мс, пакет до {INGEST_MAX_BATCH}")
+    with tempfile.TemporaryDirectory() as tmp:
+        rows_path = os.path.join(tmp, "rows.db")
+        entries = make_entries(prepare(rows_path, args.users), args.rows)
+        rows_elapsed = await per_row(rows_path, entries)
+
+        group_path = os.path.join(tmp, "group.db")
+        entries = make_entries(prepare(group_path, args.users), args.rows)
+        group_elapsed, stats = await grouped(group_path, entries)
+
+        print(f"Коміт на рядок:  {rows_elapsed:6.2f} с, {args.rows / rows_elapsed:8.1f} рядків/с, "
+              f"записано {count_rows(rows_path)}")
+        print(f"Групові коміти:  {group_elapsed:6.2f} с, {args.rows / group_elapsed:8.1f} рядків/с, "
+              f"записано {count_rows(group_path)}, пакети: {stats}")
+        print(f"Приріст: {rows_elapsed / group_elapsed:.1f}x")
+    await database.pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
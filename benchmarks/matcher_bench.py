@@ -0,0 +1,164 @@
+"""
+Порівняння однопрохідного матчера назв вправ із початковою послідовною реалізацією.
+
+Спершу перевіряє, що utils.extract_exercise_name дає той самий результат, що й еталонна реалізація,
+на золотому наборі повідомлень, потім вимірює час обох.
+
+    python -m benchmarks.matcher_bench [--number 20000]
+"""
+import argparse
+import re
+import sys
+import timeit
+
+from benchmarks.corpus import SAMPLE_MESSAGES
+from utils import extract_exercise_name
+
+GOLDEN_MESSAGES = [text for text, _ in SAMPLE_MESSAGES] + [
+    "віджимання 30 разів",
+    "віджим лежачи 10 разів",
+    "французькі жими 10 разів",
+    "планк а 60",
+    "підтягув я 8 разів",
+    "приїду 15 разів потім відтискання 20",
+    "жим грудей 10 разів",
+    "жим від грудей та присідання з штангою 8 разів",
+    "скручування і випади з гантелі 12",
+    "тяга штанги в нахилі і тяга верхнього блоку 10",
+    "зробив жим 5 разів 100 кг",
+    "Тяга Сумо 5 разів 140 кг",
+    "присідання з гантелі 10 разів 24 кг",
+    "планка на руках 45",
+    "махи гантелі 15",
+    "розведення гантелі 12 разів",
+    "вправа 10 разів",
+    "",
+]
+
+
+def legacy_extract_exercise_name(original_text, text_lower):
+    """Початкова реалізація: послідовні заміни та до ~30 викликів re.search"""
+
+    corrections = {
+        'приїде': 'присідання',
+        'приїду': 'присідання',
+        'приїдь': 'присідання',
+        'відтискань я': 'відтискання',
+        'відтискання я': 'відтискання',
+        'підтягуван я': 'підтягування',
+        'підтягув я': 'підтягування',
+        'планк а': 'планка',
+    }
+
+    corrected_text = text_lower
+    for wrong, correct in corrections.items():
+        if wrong in corrected_text:
+            corrected_text = corrected_text.replace(wrong, correct)
+
+    exercise_patterns = [
+        (r'французьк\w*\s+жим(?:\s+лежачи)?', 'французький жим лежачи'),
+
+        (r'жим\s+штанги\s+лежачи', 'жим штанги лежачи'),
+        (r'жим\s+гантел[ьі]\s+лежачи', 'жим гантель лежачи'),
+        (r'жим\s+лежачи', 'жим лежачи'),
+        (r'жим\s+стоячи', 'жим стоячи'),
+        (r'жим(?:\s+від)?\s+грудей', 'жим від грудей'),
+
+        (r'присідання\s+з\s+штангою', 'присідання з штангою'),
+        (r'присідання\s+з\s+гантел[ьі]', 'присідання з гантеллю'),
+        (r'присідання', 'присідання'),
+
+        (r'підтягування\s+широким\s+хватом', 'підтягування широким хватом'),
+        (r'підтягування\s+вузьким\s+хватом', 'підтягування вузьким хватом'),
+        (r'підтягування\s+зворотним\s+хватом', 'підтягування зворотним хватом'),
+        (r'підтягування', 'підтягування'),
+
+        (r'(?:відтискання|віджимання)\s+від\s+підлоги', 'відтискання від підлоги'),
+        (r'(?:відтискання|віджимання)\s+на\s+брусах', 'відтискання на брусах'),
+        (r'(?:відтискання|віджимання)', 'відтискання'),
+
+        (r'планка\s+на\s+ліктях', 'планка на ліктях'),
+        (r'планка\s+на\s+руках', 'планка на руках'),
+        (r'планка', 'планка'),
+
+        (r'тяга\s+штанги\s+в\s+нахилі', 'тяга штанги в нахилі'),
+        (r'тяга\s+гантел[ьі]\s+в\s+нахилі', 'тяга гантель в нахилі'),
+        (r'тяга\s+верхнього\s+блоку', 'тяга верхнього блоку'),
+
+        (r'махи\s+гантел[ьі]', 'махи гантелями'),
+        (r'розведення\s+гантел[ьі]\s+лежачи', 'розведення гантель лежачи'),
+        (r'розведення\s+гантел[ьі]', 'розведення гантель'),
+
+        (r'випади\s+з\s+гантел[ьі]', 'випади з гантелями'),
+        (r'випади', 'випади'),
+        (r'скручування', 'скручування'),
+    ]
+
+    for pattern, name in exercise_patterns:
+        if re.search(pattern, corrected_text):
+            return name
+
+    basic_exercises = ['жим', 'присідання', 'підтягування', 'відтискання', 'віджимання', 'планка', 'тяга']
+
+    for exercise in basic_exercises:
+        if exercise in corrected_text:
+            words = original_text.split()
+            exercise_words = []
+            found = False
+
+            for i, word in enumerate(words):
+                if exercise in word.lower():
+                    start_idx = max(0, i - 2)
+                    end_idx = min(len(words), i + 3)
+                    potential_name = ' '.join(words[start_idx:end_idx])
+
+                    clean_name = re.sub(r'\d+|повтор\w*|раз\w*|кг|з\s*вагою', '', potential_name).strip()
+                    clean_name = re.sub(r'\s+', ' ', clean_name)
+
+                    if len(clean_name) > len(exercise):
+                        return clean_name
+                    else:
+                        return exercise
+
+    return None
+
+
+
+def check_golden():
+    mismatches = []
+    for text in GOLDEN_MESSAGES:
+        expected = legacy_extract_exercise_name(text.strip(), text.lower().strip())
+        actual = extract_exercise_name(text.strip(), text.lower().strip())
+        if expected != actual:
+            mismatches.append((text, expected, actual))
+    return mismatches
+
+
+def bench(func, number):
+    inputs = [(text.strip(), text.lower().strip()) for text in GOLDEN_MESSAGES]
+
+    def run():
+        for original, lower in inputs:
+            func(original, lower)
+
+    seconds = min(timeit.repeat(run, number=number, repeat=3))
+    return seconds / (number * len(inputs)) * 1e6
+
+
+def main(number):
+    mismatches = check_golden()
+    for text, expected, actual in mismatches:
+        print(f"РОЗБІЖНІСТЬ: {text!r}: очікувалось {expected!r}, отримано {actual!r}")
+    print(f"Золотий набір: {len(GOLDEN_MESSAGES) - len(mismatches)}/{len(GOLDEN_MESSAGES)} збігів")
+
+    legacy_us = bench(legacy_extract_exercise_name, number)
+    compiled_us = bench(extract_exercise_name, number)
+    print(f"Послідовний пошук:  {legacy_us:8.2f} мкс/повідомлення")
+    print(f"Однопрохідний пошук: {compiled_us:8.2f} мкс/повідомлення ({legacy_us / compiled_us:.1f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    sys.exit(main(parser.parse_args().number))
@@ -0,0 +1,69 @@
+"""
+Звіт локального парсингу на корпусі зразків: частка ескалацій до Gemini та узгодженість парсерів.
+
+    python -m benchmarks.parse_report            # порівняння з очікуваними результатами корпусу
+    python -m benchmarks.parse_report --gemini   # порівняння з відповідями реального Gemini
+"""
+import argparse
+import asyncio
+
+from benchmarks.corpus import SAMPLE_MESSAGES
+from config import LOCAL_PARSE_THRESHOLD
+from utils import build_prompt, call_gemini, parse_gemini_response, score_local_parse, NOT_EXERCISE
+
+
+def same_result(a, b):
+    if not a or not b:
+        return not a and not b
+    return a["name"] == b["name"] and a["reps"] == b["reps"] and a.get("weight") == b.get("weight")
+
+
+async def reference_results(use_gemini):
+    if not use_gemini:
+        return [expected for _, expected in SAMPLE_MESSAGES]
+
+    import services
+    gemini_model = await services.get_gemini_model()
+    if not gemini_model:
+        raise SystemExit("Gemini недоступний: перевірте GEMINI_API_KEY")
+
+    results = []
+    for text, _ in SAMPLE_MESSAGES:
+        response_text = await call_gemini(gemini_model, build_prompt(text))
+        result = parse_gemini_response(text, response_text) if response_text else None
+        results.append(None if result == NOT_EXERCISE else result)
+    return results
+
+
+async def main(threshold, use_gemini):
+    references = await reference_results(use_gemini)
+    rows = []
+    for (text, _), reference in zip(SAMPLE_MESSAGES, references):
+        local, confidence = score_local_parse(text)
+        rows.append((text, local, confidence, confidence < threshold, same_result(local, reference)))
+
+    print(f"{'впевн.':>6}  {'ескал.':6}  {'збіг':4}  повідомлення")
+    for text, local, confidence, escalated, agree in rows:
+        print(f"{confidence:6.2f}  {'так' if escalated else '':6}  {'+' if agree else '-':4}  {text} → {local}")
+
+    total = len(rows)
+    escalated = [row for row in rows if row[3]]
+    confident = [row for row in rows if not row[3]]
+    reference_name = "Gemini" if use_gemini else "очікуваним результатом"
+    print()
+    print(f"Поріг впевненості: {threshold}")
+    print(f"Ескалація до Gemini: {len(escalated)}/{total} ({len(escalated) / total:.0%})")
+    if confident:
+        agree = sum(1 for row in confident if row[4])
+        print(f"Збіг з {reference_name} без ескалації: {agree}/{len(confident)} ({agree / len(confident):.0%})")
+    if escalated:
+        agree = sum(1 for row in escalated if row[4])
+        print(f"Збіг з {reference_name} серед ескальованих: {agree}/{len(escalated)} ({agree / len(escalated):.0%})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=LOCAL_PARSE_THRESHOLD)
+    parser.add_argument("--gemini", action="store_true", help="порівнювати з відповідями реального Gemini")
+    args = parser.parse_args()
+    asyncio.run(main(args.threshold, args.gemini))
@@ -0,0 +1,221 @@
+"""
+Навантажувальний тест: віртуальні користувачі проходять сценарій тренування, а їхні оновлення
+подаються в handlers.dp.feed_update так само, як їх подає polling.
+
+Зовнішні залежності замінено локальними: Bot API — FakeSession, файли Telegram — FakeFileServer,
+Gemini — FakeGeminiModel, розпізнавання мовлення — FakeBackend, ffmpeg — fakes.decode_passthrough.
+Працює з окремою тимчасовою базою.
+
+Сценарій користувача: /start, Старт, --sets підходів (частка --voice-ratio голосом, частка
+--ambiguous-ratio — тексти, які локальний парсер не розпізнає впевнено і передає в Gemini), Стоп,
+потім /last і /stats з імовірностями --last-ratio і --stats-ratio.
+
+    python -m benchmarks.replay [--users 1000] [--concurrency 100] [--sets 6] [--voice-ratio 0.2]
+                                [--output results.json] [--compare previous.json]
+"""
+import os
+import tempfile
+
+# База має бути задана до імпорту config
+if __name__ == '__main__':
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="replay_"), "replay.db")
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+from aiogram.types import Update
+
+import database
+import http_client
+import instrumentation
+import metrics
+import services
+from config import bot
+from fakes import (FakeFileServer, FakeGeminiModel, FakeSession, decode_passthrough, fake_text_update,
+                   fake_voice_update)
+from handlers import dp
+from stt import FakeBackend
+
+CONFIDENT_TEXTS = ["присідання 20 разів", "віджимання 15 разів", "підтягування 8 разів",
+                   "жим лежачи 10 разів 60 кг", "випади 12 разів з вагою 10 кг", "планка 60"]
+AMBIGUOUS_TEXTS = ["зробив ще 12", "тяга верхнього блоку", "махи гирі 15", "скакалка 100",
+                   "берпі 10", "гіперекстензія 15 разів"]
+VOICE_TEXTS = ["присідання 25 разів", "віджимання 20 разів", "жим гантелей 12 разів 20 кг"]
+
+
+def handler_samples():
+    """Назва обробника -> тривалості (с), виміряні instrumentation.handler_timer_middleware"""
+    return {re.search(r'handler="(.*)"', key).group(1): stats.samples
+            for key, stats in metrics.latency_series("handler").items()}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+class Replay:
+    def __init__(self, args, file_server, stt_backend):
+        self.args = args
+        self.file_server = file_server
+        self.stt_backend = stt_backend
+        self.rng = random.Random(args.seed)
+        self.update_id = 0
+        self.updates = 0
+
+    def next_update_id(self):
+        self.update_id += 1
+        return self.update_id
+
+    def user_script(self, user_id):
+        """Список JSON-оновлень одного користувача в порядку надсилання"""
+        rng = self.rng
+        script = [fake_text_update(self.next_update_id(), user_id, "/start"),
+                  fake_text_update(self.next_update_id(), user_id, "Старт")]
+        for i in range(self.args.sets):
+            if rng.random() < self.args.voice_ratio:
+                file_id = f"voice_{user_id}_{i}"
+                # Байти файлу однозначно визначають «розпізнаний» текст у FakeBackend
+                audio = os.urandom(self.args.voice_bytes)
+                self.file_server.files[f"voice/{file_id}.ogg"] = audio
+                self.stt_backend.add_response(audio, rng.choice(VOICE_TEXTS))
+                script.append(fake_voice_update(self.next_update_id(), user_id, file_id,
+                                                file_size=self.args.voice_bytes))
+            elif rng.random() < self.args.ambiguous_ratio:
+                script.append(fake_text_update(self.next_update_id(), user_id, rng.choice(AMBIGUOUS_TEXTS)))
+            else:
+                script.append(fake_text_update(self.next_update_id(), user_id, rng.choice(CONFIDENT_TEXTS)))
+        script.append(fake_text_update(self.next_update_id(), user_id, "Стоп"))
+        if rng.random() < self.args.last_ratio:
+            script.append(fake_text_update(self.next_update_id(), user_id, "/last"))
+        if rng.random() < self.args.stats_ratio:
+            script.append(fake_text_update(self.next_update_id(), user_id, "/stats"))
+        return script
+
+    async def run_user(self, script):
+        for raw in script:
+            update = Update.model_validate(raw, context={"bot": bot})
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                metrics.incr("replay_errors")
+                print(f"Помилка обробки оновлення {raw['update_id']}: {e}")
+            self.updates += 1
+
+    async def run(self, users):
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def limited(script):
+            async with semaphore:
+                await self.run_user(script)
+
+        scripts = [self.user_script(user_id) for user_id in users]
+        started = time.perf_counter()
+        await asyncio.gather(*[limited(script) for script in scripts])
+        return time.perf_counter() - started
+
+
+def compare(results, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nПорівняння з {previous_path} ({previous.get('started_at')}):")
+    before, after = previous["updates_per_second"], results["updates_per_second"]
+    print(f"  оновлень/с: {before:9.1f} -> {after:9.1f} ({after / before if before else 0:.2f}x)")
+    for name, stats in results["handlers"].items():
+        old = previous["handlers"].get(name)
+        if old:
+            print(f"  {name:<28} p95 {old['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f} мс, "
+                  f"p99 {old['p99_ms']:8.2f} -> {stats['p99_ms']:8.2f} мс")
+
+
+async def main(args):
+    bot.session = FakeSession(latency=args.api_latency)
+    # Ті самі middleware часу, що й у main.py; вимірювання зберігаються повністю для перцентилів
+    metrics.keep_samples = True
+    instrumentation.setup(dp, bot)
+    file_server = await FakeFileServer().start()
+    http_client.TELEGRAM_FILE_URL = file_server.file_url
+    stt_backend = FakeBackend(latency=args.stt_latency)
+    services.stt_backend = stt_backend
+    services.voice_pool.decode = decode_passthrough
+    services._gemini_model = FakeGeminiModel(latency=args.gemini_latency)
+    services._gemini_selected = True
+
+    await database.warm_exercise_cache()
+    await database.load_active_sessions()
+    await http_client.start()
+
+    replay = Replay(args, file_server, stt_backend)
+    try:
+        elapsed = await replay.run(range(1, args.users + 1))
+    finally:
+        await services.voice_pool.drain(30)
+        await http_client.close()
+        await file_server.stop()
+        await dp.storage.close()
+        await database.close()
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "args": vars(args),
+        "updates": replay.updates,
+        "elapsed_seconds": round(elapsed, 3),
+        "updates_per_second": round(replay.updates / elapsed, 1),
+        "errors": metrics.counter("replay_errors"),
+        "handlers": {name: summarize(samples) for name, samples in sorted(handler_samples().items())},
+        "metrics": metrics.snapshot(),
+    }
+
+    print(f"\nКористувачів: {args.users}, одночасно: {args.concurrency}, оновлень: {replay.updates}, "
+          f"помилок: {results['errors']}")
+    print(f"Час: {elapsed:.2f} с, {results['updates_per_second']} оновлень/с")
+    print(f"{'обробник':<28} {'к-сть':>7} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'max мс':>9}")
+    for name, stats in results["handlers"].items():
+        print(f"{name:<28} {stats['count']:>7} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+              f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Результати збережено в {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 1 if results["errors"] else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--sets", type=int, default=6)
+    parser.add_argument("--voice-ratio", type=float, default=0.2)
+    parser.add_argument("--ambiguous-ratio", type=float, default=0.1)
+    parser.add_argument("--last-ratio", type=float, default=0.5)
+    parser.add_argument("--stats-ratio", type=float, default=0.5)
+    parser.add_argument("--voice-bytes", type=int, default=16 * 1024)
+    parser.add_argument("--api-latency", type=float, default=0.02, help="затримка Bot API, с")
+    parser.add_argument("--gemini-latency", type=float, default=0.3)
+    parser.add_argument("--stt-latency", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="зберегти результати в JSON")
+    parser.add_argument("--compare", help="порівняти з попередніми результатами (JSON)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
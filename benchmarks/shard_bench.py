@@ -0,0 +1,96 @@
+"""
+Пропускна здатність робочих процесів супервізора на відтворених оновленнях.
+
+Для кожної кількості процесів запускає WorkerPool з FakeSession замість Bot API, відкриває
+тренування для --users користувачів, надсилає --messages текстових підходів і вимірює,
+скільки оновлень за секунду обробляють процеси. Використовує окрему тимчасову базу.
+
+    python -m benchmarks.shard_bench [--workers 1,2,4] [--users 200] [--messages 4000]
+"""
+import os
+import tempfile
+
+# База бенчмарку має бути задана до імпорту config; робочі процеси успадковують її через оточення
+# (і повторно імпортують цей модуль як __mp_main__, тому лише в головному процесі)
+if __name__ == '__main__':
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="shard_bench_"), "bench.db")
+    os.environ.setdefault("STT_BACKEND", "fake")
+
+import argparse
+import asyncio
+import time
+
+from aiogram.types import Update
+
+from fakes import fake_text_update
+from supervisor import WorkerPool, shard_key
+
+EXERCISES = ["присідання 20 разів", "віджимання 15 разів", "підтягування 8 разів",
+             "жим лежачи 10 разів 60 кг", "випади 12 разів з вагою 10 кг"]
+
+
+def processed(pool):
+    return sum(worker["metrics"].get("latency", {}).get("worker_update", {}).get("count", 0)
+               for worker in pool.stats().values())
+
+
+async def send(pool, updates, timeout=300):
+    """Розподіляє оновлення і чекає, поки процеси оброблять їх усі. Повертає тривалість у секундах"""
+    target = processed(pool) + len(updates)
+    started = time.perf_counter()
+    for raw in updates:
+        update = Update.model_validate(raw)
+        pool.dispatch_raw(raw, shard_key(update))
+    deadline = time.monotonic() + timeout
+    while processed(pool) < target:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Оброблено {processed(pool)} з {target}")
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - started
+
+
+async def run(workers, args, first_update_id):
+    pool = WorkerPool(workers, metrics_interval=0.05, fake_session_latency=args.api_latency)
+    pool.start()
+    await pool.wait_ready()
+
+    users = range(first_update_id, first_update_id + args.users)
+    update_id = first_update_id
+    starts = []
+    for user_id in users:
+        update_id += 1
+        starts.append(fake_text_update(update_id, user_id, "Старт"))
+    await send(pool, starts)
+
+    messages = []
+    for i in range(args.messages):
+        update_id += 1
+        messages.append(fake_text_update(update_id, users[i % len(users)], EXERCISES[i % len(EXERCISES)]))
+    elapsed = await send(pool, messages)
+
+    await pool.stop()
+    routed = pool.routed
+    return elapsed, routed
+
+
+async def main(args):
+    counts = [int(n) for n in args.workers.split(",")]
+    print(f"Користувачів: {args.users}, повідомлень: {args.messages}, затримка Bot API: {args.api_latency} с, "
+          f"ядер: {os.cpu_count()}")
+    baseline = None
+    for n, workers in enumerate(counts):
+        # Різні user_id для кожного прогону, щоб тренування не перетиналися
+        elapsed, routed = await run(workers, args, first_update_id=(n + 1) * 1_000_000)
+        rate = args.messages / elapsed
+        baseline = baseline or rate
+        print(f"Процесів: {workers}: {elapsed:6.2f} с, {rate:8.1f} оновл./с ({rate / baseline:.2f}x), "
+              f"розподіл: {routed}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=4000)
+    parser.add_argument("--api-latency", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+"""
+Підсумок тренування: групування в SQL проти вибірки всіх підходів і групування в Python.
+
+Створює тимчасову базу з однією сесією на --sets підходів, перевіряє, що обидва шляхи дають
+однаковий текст, і вимірює час запиту та форматування.
+
+    python -m benchmarks.summary_bench [--sets 5000] [--exercises 40] [--number 20]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+import database
+from migrations import migrate
+from utils import format_exercise_summary, split_message
+
+# Запит і форматування до перенесення групування в SQL
+LEGACY_SESSION_ENTRIES_SQL = '''SELECT e.name, ee.reps, ee.weight
+                                FROM exercise_entries ee
+                                JOIN exercises e ON ee.exercise_id = e.id
+                                WHERE ee.session_id = ?
+                                ORDER BY e.name, ee.timestamp'''
+
+
+def legacy_format_exercise_summary(exercises_raw):
+    exercise_groups = {}
+
+    for name, reps, weight in exercises_raw:
+        if name not in exercise_groups:
+            exercise_groups[name] = []
+
+        exercise_groups[name].append({
+            'reps': reps,
+            'weight': weight
+        })
+
+    formatted_lines = []
+
+    for exercise_name, entries in exercise_groups.items():
+        if len(entries) == 1:
+            entry = entries[0]
+            line = f"• {exercise_name} – {entry['reps']} повторів"
+            if entry['weight']:
+                line += f" з вагою {entry['weight']:.0f} кг"
+        else:
+            weight_groups = {}
+            total_reps = 0
+
+            for entry in entries:
+                weight_key = entry['weight'] if entry['weight'] else 0
+                if weight_key not in weight_groups:
+                    weight_groups[weight_key] = 0
+                weight_groups[weight_key] += entry['reps']
+                total_reps += entry['reps']
+
+            approaches_count = len(entries)
+            line = f"• {exercise_name} – {approaches_count} підходи, {total_reps} повторів:\n"
+
+            for weight, reps in sorted(weight_groups.items(), key=lambda x: x[0] or 0, reverse=True):
+                if weight > 0:
+                    line += f"  - {reps} повторів з вагою {weight:.0f} кг\n"
+                else:
+                    line += f"  - {reps} повторів без ваги\n"
+
+            line = line.rstrip('\n')
+
+        formatted_lines.append(line)
+
+    return formatted_lines
+
+
+def populate(conn, sets, exercises):
+    rng = random.Random(42)
+    started = datetime(2024, 1, 1, 9, 0)
+    with conn:
+        session_id = conn.execute("INSERT INTO training_sessions (user_id, started_at, ended_at) VALUES (1, ?, ?)",
+                                  (started, started + timedelta(hours=2))).lastrowid
+        names = [f"вправа {i:03d}" for i in range(exercises)] + ["планка"]
+        ids = [conn.execute("INSERT INTO exercises (name) VALUES (?)", (name,)).lastrowid for name in names]
+        rows = []
+        for i in range(sets):
+            # Остання вправа — рівно один підхід, щоб перевірити і цю гілку форматування
+            exercise_id = ids[-1] if i == 0 else rng.choice(ids[:-1])
+            weight = rng.choice([None, 0, 10, 20, 22.5, 40, 60, 80, 100])
+            rows.append((session_id, exercise_id, rng.randint(1, 30), weight, started + timedelta(seconds=i)))
+        conn.executemany("INSERT INTO exercise_entries (session_id, exercise_id, reps, weight, timestamp) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+    return session_id
+
+
+def legacy_summary(conn, session_id):
+    return legacy_format_exercise_summary(conn.execute(LEGACY_SESSION_ENTRIES_SQL, (session_id,)).fetchall())
+
+
+def summary(conn, session_id):
+    return format_exercise_summary(conn.execute(database.SESSION_SUMMARY_SQL, (session_id,)).fetchall())
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = database.connect(os.path.join(tmp, "bench.db"))
+        migrate(conn)
+        session_id = populate(conn, args.sets, args.exercises)
+
+        legacy_lines = legacy_summary(conn, session_id)
+        lines = summary(conn, session_id)
+        same = legacy_lines == lines
+        print(f"Підходів: {args.sets}, вправ: {args.exercises + 1}, "
+              f"рядків БД: {args.sets} -> {len(conn.execute(database.SESSION_SUMMARY_SQL, (session_id,)).fetchall())}")
+        print(f"Текст підсумку {'збігається' if same else 'НЕ ЗБІГАЄТЬСЯ'} з початковою реалізацією")
+
+        chunks = split_message("Тренування завершено! Ви зробили:", lines)
+        print(f"Повідомлень: {len(chunks)}, найдовше: {max(len(chunk) for chunk in chunks)} символів")
+
+        legacy_ms = timeit.timeit(lambda: legacy_summary(conn, session_id), number=args.number) / args.number * 1000
+        sql_ms = timeit.timeit(lambda: summary(conn, session_id), number=args.number) / args.number * 1000
+        print(f"Групування в Python: {legacy_ms:8.2f} мс/підсумок")
+        print(f"Групування в SQL:    {sql_ms:8.2f} мс/підсумок ({legacy_ms / sql_ms:.1f}x)")
+        conn.close()
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=5000)
+    parser.add_argument("--exercises", type=int, default=40)
+    parser.add_argument("--number", type=int, default=20)
+    sys.exit(main(parser.parse_args()))
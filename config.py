@@ -1,10 +1,136 @@
 from dotenv import load_dotenv
 import os
 from aiogram import Bot
-from aiogram.fsm.storage.memory import MemoryStorage
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+
+# База даних
+DB_PATH = os.getenv("DB_PATH", "workouts.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+EXERCISE_CACHE_SIZE = int(os.getenv("EXERCISE_CACHE_SIZE", "1024"))
+# Групові записи підходів: вікно (мс), максимальний розмір пакета і режим fsync для їхнього коміту
+INGEST_WINDOW_MS = int(os.getenv("INGEST_WINDOW_MS", "5"))
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "200"))
+INGEST_SYNCHRONOUS = os.getenv("INGEST_SYNCHRONOUS", "FULL")
+
+# Gemini
+# Файл зі збереженим вибором моделі та час, після якого моделі перевіряються знову
+GEMINI_MODEL_CACHE = os.getenv("GEMINI_MODEL_CACHE", ".gemini_model.json")
+GEMINI_MODEL_CACHE_TTL = int(os.getenv("GEMINI_MODEL_CACHE_TTL", str(24 * 3600)))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "8"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "0.5"))
+# Якщо вибір моделі не вдався (мережа, квота), повторюємо його через паузу, що подвоюється до максимуму (с)
+GEMINI_SELECT_BACKOFF = float(os.getenv("GEMINI_SELECT_BACKOFF", "30"))
+GEMINI_SELECT_BACKOFF_MAX = float(os.getenv("GEMINI_SELECT_BACKOFF_MAX", "600"))
+# Мінімальна впевненість локального парсера, за якої Gemini не викликається
+LOCAL_PARSE_THRESHOLD = float(os.getenv("LOCAL_PARSE_THRESHOLD", "0.8"))
+# Пакетна обробка: повідомлення, що надійшли протягом вікна, відправляються одним запитом
+GEMINI_BATCH_ENABLED = os.getenv("GEMINI_BATCH_ENABLED", "false").lower() == "true"
+GEMINI_BATCH_WINDOW_MS = int(os.getenv("GEMINI_BATCH_WINDOW_MS", "100"))
+GEMINI_BATCH_MAX_SIZE = int(os.getenv("GEMINI_BATCH_MAX_SIZE", "16"))
+
+# Кеш результатів парсингу
+PARSE_CACHE_MEMORY_SIZE = int(os.getenv("PARSE_CACHE_MEMORY_SIZE", "2048"))
+PARSE_CACHE_TTL = int(os.getenv("PARSE_CACHE_TTL", str(30 * 24 * 3600)))
+PARSE_CACHE_MAX_ROWS = int(os.getenv("PARSE_CACHE_MAX_ROWS", "50000"))
+
+# Обробка голосових повідомлень
+VOICE_QUEUE_SIZE = int(os.getenv("VOICE_QUEUE_SIZE", "20"))
+VOICE_WORKERS = int(os.getenv("VOICE_WORKERS", "4"))
+# Потоки декодування: кожен лише чекає на окремий процес ffmpeg (VOICE_DECODE_PROCESSES — стара назва)
+VOICE_DECODE_THREADS = int(os.getenv("VOICE_DECODE_THREADS", os.getenv("VOICE_DECODE_PROCESSES", "2")))
+VOICE_DRAIN_TIMEOUT = float(os.getenv("VOICE_DRAIN_TIMEOUT", "30"))
+# Обмеження голосового повідомлення: тривалість (с) і розмір файлу (байти)
+VOICE_MAX_DURATION = int(os.getenv("VOICE_MAX_DURATION", "60"))
+VOICE_MAX_BYTES = int(os.getenv("VOICE_MAX_BYTES", str(1024 * 1024)))
+VOICE_SAMPLE_RATE = int(os.getenv("VOICE_SAMPLE_RATE", "16000"))
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+# Рушій розпізнавання мовлення: google (мережевий), vosk (офлайн, моделі в STT_VOSK_MODELS), fake (для бенчмарків)
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+STT_VOSK_MODELS = os.getenv("STT_VOSK_MODELS", "")
+# Розпізнавання мовлення: sequential — мови по черзі, concurrent — усі одночасно, перемагає перший
+# впевнений результат, ranked — усі одночасно, перемагає найвпевненіший
+STT_STRATEGY = os.getenv("STT_STRATEGY", "concurrent")
+STT_LANGUAGES = [lang.strip() for lang in os.getenv("STT_LANGUAGES", "uk-UA,ru-RU,en-US").split(",")]
+STT_MIN_CONFIDENCE = float(os.getenv("STT_MIN_CONFIDENCE", "0.8"))
+STT_PREFERRED_CACHE_SIZE = int(os.getenv("STT_PREFERRED_CACHE_SIZE", "10000"))
+# Потоки розпізнавання: за замовчуванням кожен обробник голосу може одночасно пробувати всі мови,
+# тож спроби одного повідомлення не займають потоки, потрібні іншим повідомленням
+VOICE_RECOGNIZE_THREADS = int(os.getenv(
+    "VOICE_RECOGNIZE_THREADS", str(VOICE_WORKERS * (1 if STT_STRATEGY == "sequential" else len(STT_LANGUAGES)))))
+
+# Спільний HTTP-клієнт для завантаження файлів Telegram
+TELEGRAM_FILE_URL = os.getenv("TELEGRAM_FILE_URL", "https://api.telegram.org/file/bot{token}/{file_path}")
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CHUNK_SIZE = int(os.getenv("HTTP_CHUNK_SIZE", str(64 * 1024)))
+
+# Сховище станів FSM: sqlite (у базі даних, переживає перезапуск) або memory
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+# Як часто зберігати накопичені зміни станів (мс) і скільки станів тримати в пам'яті
+FSM_FLUSH_INTERVAL_MS = int(os.getenv("FSM_FLUSH_INTERVAL_MS", "200"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+
+# Режим отримання оновлень: polling або webhook (вбудований aiohttp-сервер)
+RUN_MODE = os.getenv("RUN_MODE", "polling")
+# Публічна адреса, яку отримає Telegram у set_webhook (без шляху). Порожня — webhook не реєструється
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Без WEBHOOK_SECRET режим webhook не запускається; WEBHOOK_ALLOW_INSECURE=1 — лише для локальних запусків
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_ALLOW_INSECURE = os.getenv("WEBHOOK_ALLOW_INSECURE", "false").lower() in ("1", "true", "yes")
+WEBHOOK_SHUTDOWN_TIMEOUT = float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT", "30"))
+# Скільки чекати обробників, що ще виконуються, після зупинки polling (с)
+POLLING_SHUTDOWN_TIMEOUT = float(os.getenv("POLLING_SHUTDOWN_TIMEOUT", "30"))
+
+# Кількість робочих процесів. Більше 1 — супервізор розподіляє оновлення між процесами за user_id;
+# пули голосу (VOICE_*) і з'єднань (DB_POOL_SIZE) створюються в кожному процесі окремо
+WORKERS = int(os.getenv("WORKERS", "1"))
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+# Як часто робочі процеси надсилають супервізору свої метрики (с) і скільки чекати їх завершення
+WORKER_METRICS_INTERVAL = float(os.getenv("WORKER_METRICS_INTERVAL", "5"))
+WORKER_STOP_TIMEOUT = float(os.getenv("WORKER_STOP_TIMEOUT", "60"))
+# Як часто супервізор перевіряє, чи живі робочі процеси, і перезапускає завершені (с)
+WORKER_CHECK_INTERVAL = float(os.getenv("WORKER_CHECK_INTERVAL", "1"))
+
+# Метрики у форматі Prometheus: GET http://METRICS_HOST:METRICS_PORT/metrics (0 — вимкнено)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+# Як часто вимірювати затримку event loop (с)
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+# Контроль допуску (admission.py): на користувача — дозволів за хвилину і запас поспіль,
+# глобально — одночасних голосових повідомлень і звернень до Gemini. 0 — без обмеження
+VOICE_USER_RATE = float(os.getenv("VOICE_USER_RATE", "6"))
+VOICE_USER_BURST = int(os.getenv("VOICE_USER_BURST", "3"))
+VOICE_MAX_IN_FLIGHT = int(os.getenv("VOICE_MAX_IN_FLIGHT", str(VOICE_QUEUE_SIZE + VOICE_WORKERS)))
+LLM_USER_RATE = float(os.getenv("LLM_USER_RATE", "20"))
+LLM_USER_BURST = int(os.getenv("LLM_USER_BURST", "5"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+ADMISSION_USERS_CACHE_SIZE = int(os.getenv("ADMISSION_USERS_CACHE_SIZE", "10000"))
+
+# Профілювання: журнал повільних оновлень і сторож event loop з самого запуску (інакше — командою /profile on)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+# Telegram id адміністраторів через кому: лише їм доступна команда /profile
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+# Куди зберігати профілі CPU і скільки секунд профілювати за замовчуванням (і не більше ніж)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "30"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+# Оновлення, довші за SLOW_UPDATE_MS, журналюються з розбивкою за етапами;
+# блокування event loop, довші за LOOP_BLOCK_MS, журналюються зі стеком
+SLOW_UPDATE_MS = float(os.getenv("SLOW_UPDATE_MS", "1000"))
+LOOP_BLOCK_MS = float(os.getenv("LOOP_BLOCK_MS", "100"))
+
+# Журнал часу запуску: від старту процесу до першого отриманого оновлення
+STARTUP_LOG = os.getenv("STARTUP_LOG", "startup_times.jsonl")
+
 bot = Bot(token=TELEGRAM_TOKEN)
-storage = MemoryStorage()
\ No newline at end of file
@@ -1,65 +1,337 @@
+import asyncio
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import metrics
+import profiling
+import rollups
+from batching import MicroBatcher
+from cache import LRUCache
+from migrations import migrate
+from config import (DB_PATH, DB_POOL_SIZE, EXERCISE_CACHE_SIZE, INGEST_WINDOW_MS, INGEST_MAX_BATCH,
+                    INGEST_SYNCHRONOUS)
+
+
+def connect(path=DB_PATH, synchronous="NORMAL"):
+    """Відкриває з'єднання SQLite у режимі WAL, придатне для використання з різних потоків"""
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    return conn
+
+
 def init_db():
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS training_sessions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        started_at DATETIME NOT NULL,
-        ended_at DATETIME
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS exercises (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT UNIQUE NOT NULL
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS exercise_entries (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        session_id INTEGER NOT NULL,
-        exercise_id INTEGER NOT NULL,
-        reps INTEGER NOT NULL,
-        weight INTEGER,
-        timestamp DATETIME NOT NULL,
-        FOREIGN KEY (session_id) REFERENCES training_sessions(id),
-        FOREIGN KEY (exercise_id) REFERENCES exercises(id)
-    )''')
-    conn.commit()
+    conn = connect()
+    migrate(conn)
     conn.close()
 
 
 init_db()
 
 
-def get_or_create_exercise_id(name):
-    conn = sqlite3.connect("workouts.db")
+def _run_in_transaction(conn, func, args):
+    with conn:
+        return func(conn, *args)
+
+
+class ConnectionPool:
+    """Фіксований пул довготривалих з'єднань SQLite, запити виконуються поза event loop"""
+
+    def __init__(self, path, size, synchronous="NORMAL", name="db_pool"):
+        self.path = path
+        self.size = size
+        self.synchronous = synchronous
+        self.name = name
+        self._connections = []
+        self._idle = None
+        self._executor = None
+        self._closed = False
+        self.wait_stats = metrics.latency(f"{name}_wait")
+
+    def _open(self):
+        if self._idle is not None:
+            return
+        if self._closed:
+            # Повторне відкриття після close() загубило б запис: задача буде скасована разом з event loop
+            raise RuntimeError(f"Пул з'єднань {self.name} закрито")
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=self.name)
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            conn = connect(self.path, self.synchronous)
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    @profiling.staged("db")
+    async def run(self, func, *args):
+        """Виконує func(conn, *args) в окремій транзакції на вільному з'єднанні пулу"""
+        self._open()
+        started = time.perf_counter()
+        conn = await self._idle.get()
+        self.wait_stats.observe(time.perf_counter() - started)
+
+        loop = asyncio.get_running_loop()
+        idle = self._idle
+
+        def release(_):
+            # З'єднання повертається в пул лише після фактичного завершення запиту в потоці
+            try:
+                loop.call_soon_threadsafe(idle.put_nowait, conn)
+            except RuntimeError:
+                pass
+
+        future = self._executor.submit(_run_in_transaction, conn, func, args)
+        future.add_done_callback(release)
+        query = f"{func.__module__}.{func.__name__.lstrip('_')}"
+        with metrics.latency(metrics.labeled("db_query", query=query)).time():
+            return await asyncio.wrap_future(future)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle is not None else self.size,
+            "wait": self.wait_stats.snapshot(),
+        }
+
+    async def close(self):
+        self._closed = True
+        if self._idle is None:
+            return
+        self._executor.shutdown(wait=True)
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self._idle = None
+        self._executor = None
+
+
+pool = ConnectionPool(DB_PATH, DB_POOL_SIZE)
+# Окреме з'єднання для групових записів підходів: одна транзакція на пакет, fsync при кожному коміті
+writer = ConnectionPool(DB_PATH, 1, synchronous=INGEST_SYNCHRONOUS, name="db_writer")
+
+# Назва вправи -> id. Змінюється лише в потоці event loop
+exercise_ids = LRUCache(EXERCISE_CACHE_SIZE)
+
+# user_id -> id активної сесії. Авторитетна копія стану training_sessions.ended_at IS NULL:
+# оновлюється після кожного запису, що відкриває чи закриває сесію, і відновлюється з БД при старті
+active_sessions = {}
+
+# Гарячі запити обробників. Їхні плани перевіряє `python migrations.py`
+ACTIVE_SESSIONS_SQL = "SELECT user_id, MAX(id) FROM training_sessions WHERE ended_at IS NULL GROUP BY user_id"
+LAST_SESSION_SQL = ("SELECT id, started_at FROM training_sessions "
+                    "WHERE user_id = ? AND ended_at IS NOT NULL ORDER BY ended_at DESC LIMIT 1")
+# Підсумок сесії групується в SQL: (name, вага або 0, підходи, сума повторів) на кожну пару вправа-вага
+SESSION_SUMMARY_SQL = '''SELECT e.name, COALESCE(ee.weight, 0) AS weight, COUNT(*), SUM(ee.reps)
+                         FROM exercise_entries ee
+                         JOIN exercises e ON ee.exercise_id = e.id
+                         WHERE ee.session_id = ?
+                         GROUP BY e.name, COALESCE(ee.weight, 0)
+                         ORDER BY e.name, weight DESC'''
+# /stats читає лише зведення, які оновлюються в тих самих транзакціях, що й історія (див. rollups.py)
+USER_STATS_SQL = "SELECT session_count, entry_count FROM user_stats WHERE user_id = ?"
+TOP_EXERCISES_SQL = '''SELECT e.name, s.sets, s.reps
+                       FROM user_exercise_stats s
+                       JOIN exercises e ON s.exercise_id = e.id
+                       WHERE s.user_id = ?
+                       ORDER BY s.sets DESC
+                       LIMIT 3'''
+
+# name -> (sql, приклад параметрів, індекс, який має використовуватись)
+HOT_QUERIES = {
+    "active_sessions": (ACTIVE_SESSIONS_SQL, (), "idx_sessions_active"),
+    "last_session": (LAST_SESSION_SQL, (1,), "idx_sessions_finished"),
+    "session_summary": (SESSION_SUMMARY_SQL, (1,), "idx_entries_session"),
+    "stats_user": (USER_STATS_SQL, (1,), "INTEGER PRIMARY KEY"),
+    "stats_top_exercises": (TOP_EXERCISES_SQL, (1,), "idx_user_exercise_stats_top"),
+}
+
+
+def _get_or_create_exercise_id(conn, name):
+    # INSERT OR IGNORE + SELECT безпечні при одночасній вставці тієї ж назви з різних з'єднань
     c = conn.cursor()
+    c.execute("INSERT OR IGNORE INTO exercises (name) VALUES (?)", (name,))
     c.execute("SELECT id FROM exercises WHERE name = ?", (name,))
-    result = c.fetchone()
-    if result:
-        exercise_id = result[0]
-    else:
-        c.execute("INSERT INTO exercises (name) VALUES (?)", (name,))
-        exercise_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    return c.fetchone()[0]
+
+
+def _load_exercises(conn, limit):
+    return conn.execute("SELECT name, id FROM exercises ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+
+def _load_active_sessions(conn):
+    return conn.execute(ACTIVE_SESSIONS_SQL).fetchall()
+
+
+def _close_active_session(conn, user_id):
+    c = conn.execute("UPDATE training_sessions SET ended_at = ? WHERE user_id = ? AND ended_at IS NULL",
+                     (datetime.now(), user_id))
+    rollups.record_closed_sessions(conn, user_id, c.rowcount)
+
+
+def _start_session(conn, user_id):
+    _close_active_session(conn, user_id)
+    c = conn.cursor()
+    c.execute("INSERT INTO training_sessions (user_id, started_at) VALUES (?, ?)",
+              (user_id, datetime.now()))
+    return c.lastrowid
+
+
+def _session_summary(conn, session_id):
+    c = conn.cursor()
+    c.execute(SESSION_SUMMARY_SQL, (session_id,))
+    return c.fetchall()
+
+
+def _finish_session(conn, user_id, session_id):
+    # Умова ended_at IS NULL не дає двічі врахувати сесію у зведенні
+    c = conn.execute("UPDATE training_sessions SET ended_at = ? WHERE id = ? AND ended_at IS NULL",
+                     (datetime.now(), session_id))
+    rollups.record_closed_sessions(conn, user_id, c.rowcount)
+    return _session_summary(conn, session_id)
+
+
+def _get_last_session(conn, user_id):
+    c = conn.cursor()
+    c.execute(LAST_SESSION_SQL, (user_id,))
+    session = c.fetchone()
+    if not session:
+        return None, []
+    return session, _session_summary(conn, session[0])
+
+
+def _get_user_stats(conn, user_id):
+    c = conn.cursor()
+    c.execute(USER_STATS_SQL, (user_id,))
+    session_count, exercise_count = c.fetchone() or (0, 0)
+
+    c.execute(TOP_EXERCISES_SQL, (user_id,))
+    top_exercises = c.fetchall()
+    return session_count, exercise_count, top_exercises
+
+
+def _add_exercise_entry(conn, user_id, session_id, exercise_id, name, reps, weight):
+    if exercise_id is None:
+        exercise_id = _get_or_create_exercise_id(conn, name)
+    conn.execute(
+        "INSERT INTO exercise_entries (session_id, exercise_id, reps, weight, timestamp) VALUES (?, ?, ?, ?, ?)",
+        (session_id, exercise_id, reps, weight, datetime.now()))
+    rollups.record_entry(conn, user_id, exercise_id, reps)
+    return exercise_id
+
+
+def _add_exercise_entry_isolated(conn, entry):
+    """Записує підхід у власній точці збереження; помилку повертає як результат, а не кидає"""
+    conn.execute("SAVEPOINT entry")
+    try:
+        result = _add_exercise_entry(conn, *entry)
+    except Exception as e:
+        conn.execute("ROLLBACK TO entry")
+        result = e
+    conn.execute("RELEASE entry")
+    return result
+
+
+def _add_exercise_entries(conn, entries):
+    """
+    Пакет пишеться однією транзакцією. Якщо якийсь підхід не записався, пакет відкочується і підходи
+    пишуться поодинці: помилка дістається лише автору свого підходу, решта пакета зберігається
+    """
+    conn.execute("SAVEPOINT batch")
+    try:
+        results = [_add_exercise_entry(conn, *entry) for entry in entries]
+    except Exception:
+        conn.execute("ROLLBACK TO batch")
+        results = [_add_exercise_entry_isolated(conn, entry) for entry in entries]
+    conn.execute("RELEASE batch")
+    return results
+
+
+async def warm_exercise_cache():
+    """Завантажує назви вправ у кеш при старті, щоб запис підходу не звертався до таблиці exercises"""
+    rows = await pool.run(_load_exercises, exercise_ids.maxsize)
+    for name, exercise_id in reversed(rows):
+        exercise_ids.put(name, exercise_id)
+    print(f"Кеш вправ прогріто: {len(rows)} назв")
+
+
+async def get_or_create_exercise_id(name):
+    exercise_id = exercise_ids.get(name)
+    if exercise_id is None:
+        exercise_id = await pool.run(_get_or_create_exercise_id, name)
+        exercise_ids.put(name, exercise_id)
     return exercise_id
 
 
+async def load_active_sessions():
+    """Відновлює кеш активних сесій з бази даних (після перезапуску)"""
+    rows = await pool.run(_load_active_sessions)
+    active_sessions.clear()
+    active_sessions.update(rows)
+    print(f"Відновлено активних сесій: {len(rows)}")
+
+
 def get_active_session(user_id):
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-    c.execute("SELECT id FROM training_sessions WHERE user_id = ? AND ended_at IS NULL", (user_id,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
+    """Повертає id активної сесії з кешу, без звернення до бази даних"""
+    return active_sessions.get(user_id)
 
 
-def close_active_session(user_id):
+async def close_active_session(user_id):
     """Закрити активну сесію якщо вона є"""
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-    c.execute("UPDATE training_sessions SET ended_at = ? WHERE user_id = ? AND ended_at IS NULL",
-              (datetime.now(), user_id))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    await pool.run(_close_active_session, user_id)
+    active_sessions.pop(user_id, None)
+
+
+async def start_session(user_id):
+    """Закриває незавершену сесію (на випадок збою) і відкриває нову, повертає її id"""
+    session_id = await pool.run(_start_session, user_id)
+    active_sessions[user_id] = session_id
+    return session_id
+
+
+async def finish_session(user_id, session_id):
+    """Завершує сесію та повертає її згрупований підсумок (name, weight, sets, reps)"""
+    exercises = await pool.run(_finish_session, user_id, session_id)
+    if active_sessions.get(user_id) == session_id:
+        del active_sessions[user_id]
+    return exercises
+
+
+async def get_last_session(user_id):
+    """Повертає ((id, started_at), підсумок) останньої завершеної сесії або (None, [])"""
+    return await pool.run(_get_last_session, user_id)
+
+
+async def get_user_stats(user_id):
+    """Повертає (кількість тренувань, кількість вправ, топ-3 вправи)"""
+    return await pool.run(_get_user_stats, user_id)
+
+
+async def _write_entries(entries):
+    with metrics.latency("ingest_commit").time():
+        results = await writer.run(_add_exercise_entries, entries)
+    failed = sum(isinstance(result, Exception) for result in results)
+    if failed:
+        metrics.incr("ingest_failed_entries", failed)
+    return results
+
+
+# Записи підходів від усіх користувачів, що надійшли протягом INGEST_WINDOW_MS, комітяться разом
+entry_batcher = MicroBatcher(_write_entries, INGEST_WINDOW_MS / 1000, INGEST_MAX_BATCH, name="ingest")
+
+
+async def add_exercise_entry(user_id, session_id, name, reps, weight):
+    """Записує підхід і повертається лише після коміту пакета, до якого він потрапив"""
+    exercise_id = await entry_batcher.submit((user_id, session_id, exercise_ids.get(name), name, reps, weight))
+    exercise_ids.put(name, exercise_id)
+
+
+async def flush_entries():
+    """Записує підходи, що ще чекають у пакеті, і більше не приймає нових. Викликати до закриття writer"""
+    await entry_batcher.drain()
+
+
+async def close():
+    await flush_entries()
+    await writer.close()
+    await pool.close()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import re
+import time
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetFile, SendMessage
+from aiogram.types import File, Message
+from aiohttp import web
+
+from config import VOICE_SAMPLE_RATE
+from utils import smart_local_parse
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """
+    Локальна заміна genai.GenerativeModel для тестів і бенчмарків.
+    Відповідає результатом smart_local_parse із заданою затримкою, не звертаючись до мережі.
+    Розуміє і одиночний, і пакетний промпт (відповідає JSON-масивом)
+    """
+
+    def __init__(self, latency=0.2, per_item_latency=0.0, fail=False):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.fail = fail
+        self.calls = 0
+
+    def answer(self, text):
+        result = smart_local_parse(text)
+        return result if result else {"error": "not_exercise"}
+
+    def generate_content(self, prompt, request_options=None):
+        self.calls += 1
+        if self.fail:
+            time.sleep(self.latency)
+            raise RuntimeError("FakeGeminiModel: штучна помилка")
+
+        if 'ВХІДНІ ТЕКСТИ' in prompt:
+            texts = re.findall(r'^(\d+)\. "(.*)"$', prompt, re.MULTILINE)
+            time.sleep(self.latency + self.per_item_latency * len(texts))
+            answers = [dict(self.answer(text), i=int(i)) for i, text in texts]
+            return FakeResponse(json.dumps(answers, ensure_ascii=False))
+
+        time.sleep(self.latency + self.per_item_latency)
+        match = re.search(r'ВХІДНИЙ ТЕКСТ: "(.*)"', prompt)
+        text = match.group(1) if match else ""
+        return FakeResponse(json.dumps(self.answer(text), ensure_ascii=False))
+
+
+def decode_passthrough(data):
+    """Заміна voice_pool.decode_ogg без ffmpeg: байти файлу вважаються вже декодованим PCM"""
+    return data, VOICE_SAMPLE_RATE, 2
+
+
+class FakeSession(BaseSession):
+    """
+    Сесія Bot API без мережі: кожен виклик чекає latency секунд і повертає правдоподібну відповідь
+    (Message для sendMessage, File для getFile, True для решти). Викликані методи зберігаються в requests
+    """
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.requests = []
+        self._message_id = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.requests.append(method)
+        if isinstance(method, SendMessage):
+            self._message_id += 1
+            return Message.model_validate({
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id, "type": "private"},
+                "text": method.text,
+            }, context={"bot": bot})
+        if isinstance(method, GetFile):
+            return File(file_id=method.file_id, file_unique_id=method.file_id,
+                        file_path=f"voice/{method.file_id}.ogg")
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def _fake_message(update_id, user_id, **content):
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": dict({
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+        }, **content),
+    }
+
+
+def fake_text_update(update_id, user_id, text):
+    """JSON оновлення Telegram з текстовим повідомленням (команди "/..." отримують entity bot_command)"""
+    content = {"text": text}
+    if text.startswith("/"):
+        content["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return _fake_message(update_id, user_id, **content)
+
+
+def fake_voice_update(update_id, user_id, file_id="voice", duration=3, file_size=16 * 1024):
+    """JSON оновлення Telegram з голосовим повідомленням"""
+    return _fake_message(update_id, user_id, voice={
+        "file_id": file_id, "file_unique_id": file_id, "duration": duration,
+        "mime_type": "audio/ogg", "file_size": file_size,
+    })
+
+
+class FakeFileServer:
+    """
+    Локальна заміна файлового сервера Telegram на aiohttp: GET /file/bot{token}/{file_path}
+    віддає зареєстровані байти (або випадкові для невідомого шляху). Для тестів завантаження голосу
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, default_size=16 * 1024):
+        self.host = host
+        self.port = port
+        self.default_size = default_size
+        self.files = {}
+        self.requests = 0
+        self._runner = None
+
+    async def _handle(self, request):
+        self.requests += 1
+        file_path = request.match_info["file_path"]
+        data = self.files.get(file_path)
+        if data is None:
+            data = self.files[file_path] = os.urandom(self.default_size)
+        return web.Response(body=data, content_type="audio/ogg")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/file/bot{token}/{file_path:.+}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def file_url(self):
+        """Шаблон для TELEGRAM_FILE_URL"""
+        return f"http://{self.host}:{self.port}/file/bot{{token}}/{{file_path}}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
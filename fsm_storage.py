@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import database
+import metrics
+from cache import LRUCache
+
+EMPTY_RECORD = (None, {})
+
+
+def storage_key(key):
+    """Рядковий ключ таблиці fsm_state з aiogram StorageKey"""
+    return ":".join(str(part) for part in (key.bot_id, key.chat_id, key.user_id, key.thread_id,
+                                           key.business_connection_id, key.destiny))
+
+
+def _select(conn, key):
+    return conn.execute("SELECT state, data FROM fsm_state WHERE key = ?", (key,)).fetchone()
+
+
+def _write(conn, records):
+    # Порожній запис (без стану і даних) видаляється, щоб таблиця не росла від /start і state.clear()
+    now = time.time()
+    conn.executemany("DELETE FROM fsm_state WHERE key = ?",
+                     [(key,) for key, (state, data) in records.items() if state is None and not data])
+    conn.executemany(
+        '''INSERT INTO fsm_state (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+           ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data,
+                                          updated_at = excluded.updated_at''',
+        [(key, state, json.dumps(data, ensure_ascii=False), now)
+         for key, (state, data) in records.items() if state is not None or data])
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Сховище FSM у таблиці fsm_state тієї ж бази даних.
+    Читання проходить через LRU у пам'яті, записи накопичуються і зберігаються однією транзакцією
+    раз на flush_interval секунд та при закритті. Кеш локальний для процесу, тож кілька процесів
+    можуть ділити базу, якщо кожного користувача обслуговує один процес (шардинг за user_id)
+    """
+
+    def __init__(self, flush_interval, cache_size):
+        self.flush_interval = flush_interval
+        self._cache = LRUCache(cache_size)
+        # Записи, ще не збережені в БД, і записи, що зберігаються зараз: читання перевіряє їх першими
+        self._dirty = {}
+        self._flushing = {}
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+        self._tasks = set()
+        self.flush_stats = metrics.latency("fsm_flush")
+
+    async def _get_record(self, key):
+        record = self._dirty.get(key) or self._flushing.get(key) or self._cache.get(key)
+        if record is not None:
+            return record
+
+        metrics.incr("fsm_db_reads")
+        row = await database.pool.run(_select, key)
+        # Поки йшло читання, запис міг змінитися в цьому процесі
+        record = self._dirty.get(key) or self._flushing.get(key) or self._cache.get(key)
+        if record is None:
+            record = (row[0], json.loads(row[1])) if row else EMPTY_RECORD
+            self._cache.put(key, record)
+        return record
+
+    def _set_record(self, key, record):
+        self._cache.put(key, record)
+        self._dirty[key] = record
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Зберігає накопичені записи однією транзакцією"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            self._flushing, self._dirty = self._dirty, {}
+            try:
+                with self.flush_stats.time():
+                    await database.pool.run(_write, self._flushing)
+                metrics.incr("fsm_flushed_records", len(self._flushing))
+            except Exception as e:
+                print(f"Помилка збереження станів FSM: {e}")
+                metrics.incr("fsm_flush_errors")
+                # Новіші записи, що з'явилися під час збереження, мають пріоритет
+                self._dirty = {**self._flushing, **self._dirty}
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._schedule_flush)
+            finally:
+                self._flushing = {}
+
+    async def set_state(self, key, state=None):
+        key = storage_key(key)
+        _, data = await self._get_record(key)
+        self._set_record(key, (state.state if isinstance(state, State) else state, data))
+
+    async def get_state(self, key):
+        state, _ = await self._get_record(storage_key(key))
+        return state
+
+    async def set_data(self, key, data):
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        key = storage_key(key)
+        state, _ = await self._get_record(key)
+        self._set_record(key, (state, data.copy()))
+
+    async def get_data(self, key):
+        _, data = await self._get_record(storage_key(key))
+        return data.copy()
+
+    def stats(self):
+        return {
+            "cache": self._cache.stats(),
+            "dirty": len(self._dirty),
+            "db_reads": metrics.counter("fsm_db_reads"),
+            "flushed": metrics.counter("fsm_flushed_records"),
+            "flush": self.flush_stats.snapshot(),
+        }
+
+    async def close(self):
+        """Зберігає всі накопичені записи. Викликати до закриття пулу з'єднань"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+
+def create_storage(name, flush_interval=0.2, cache_size=10000):
+    if name == "sqlite":
+        return SQLiteStorage(flush_interval, cache_size)
+    if name == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Невідоме сховище FSM: {name}")
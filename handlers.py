@@ -1,20 +1,44 @@
+import asyncio
 from aiogram import Dispatcher, types
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram import F
-from database import get_active_session, get_or_create_exercise_id, close_active_session
-from utils import parse_exercise, format_exercise_summary
+import admission
+import database
+import profiling
+from utils import parse_exercise, format_exercise_summary, split_message
 from services import recognize_voice
+from voice_pool import VoiceQueueFull
 from datetime import datetime
-from config import bot, storage, TELEGRAM_TOKEN
-import sqlite3
-import aiohttp
-import aiofiles
-import os
-import tempfile
+from config import (bot, VOICE_MAX_DURATION, VOICE_MAX_BYTES, FSM_STORAGE, FSM_FLUSH_INTERVAL_MS, FSM_CACHE_SIZE,
+                    ADMIN_IDS, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS)
+from fsm_storage import create_storage
+import http_client
 
-dp = Dispatcher(storage=storage)
+
+class TrackingDispatcher(Dispatcher):
+    """
+    Dispatcher, що пам'ятає задачі, які зараз обробляють оновлення. start_polling при зупинці
+    не чекає своїх обробників, тож main дочікується їх через update_tasks
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.update_tasks = set()
+
+    async def feed_update(self, bot, update, **kwargs):
+        task = asyncio.current_task()
+        self.update_tasks.add(task)
+        try:
+            return await super().feed_update(bot, update, **kwargs)
+        finally:
+            self.update_tasks.discard(task)
+
+
+dp = TrackingDispatcher(storage=create_storage(FSM_STORAGE, FSM_FLUSH_INTERVAL_MS / 1000, FSM_CACHE_SIZE))
+# Автор повідомлення для обмеження звернень до Gemini (admission.try_acquire_llm)
+dp.message.middleware(admission.admission_middleware)
 
 
 class WorkoutState(StatesGroup):
@@ -42,16 +66,8 @@ async def start_workout(message: types.Message, state: FSMContext):
         await message.answer("Тренування вже активне. Надсилайте вправи або натисніть Стоп, щоб завершити.")
         return
 
-    # Закриваємо будь-яку активну сесію в БД (на випадок збою)
-    close_active_session(user_id)
-
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO training_sessions (user_id, started_at) VALUES (?, ?)",
-              (user_id, datetime.now()))
-    session_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    # Закриваємо будь-яку активну сесію в БД (на випадок збою) і відкриваємо нову
+    session_id = await database.start_session(user_id)
 
     await state.set_state(WorkoutState.ACTIVE)
     await state.update_data(session_id=session_id)
@@ -74,34 +90,21 @@ async def stop_workout(message: types.Message, state: FSMContext):
         await message.answer("Ви ще не почали тренування. Натисніть 'Старт', щоб почати.")
         return
 
-    session_id = get_active_session(user_id)
+    session_id = database.get_active_session(user_id)
     if not session_id:
         await message.answer("Сесію вже завершено. Натисніть 'Старт', щоб почати нову.")
         await state.clear()
         return
 
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-    c.execute("UPDATE training_sessions SET ended_at = ? WHERE id = ?",
-              (datetime.now(), session_id))
-
-    # Отримуємо всі записи вправ (без групування в SQL)
-    c.execute('''SELECT e.name, ee.reps, ee.weight
-                 FROM exercise_entries ee
-                 JOIN exercises e ON ee.exercise_id = e.id
-                 WHERE ee.session_id = ?
-                 ORDER BY e.name, ee.timestamp''', (session_id,))
-    exercises = c.fetchall()
-    conn.commit()
-    conn.close()
+    # Записи вправ приходять уже згрупованими за назвою та вагою
+    exercises = await database.finish_session(user_id, session_id)
 
     if not exercises:
         await message.answer("Тренування завершено! Ви не додали жодної вправи.")
     else:
-        summary = "Тренування завершено! Ви зробили:\n"
         formatted_exercises = format_exercise_summary(exercises)
-        summary += "\n".join(formatted_exercises)
-        await message.answer(summary)
+        for chunk in split_message("Тренування завершено! Ви зробили:", formatted_exercises):
+            await message.answer(chunk)
 
     await state.clear()
 
@@ -109,33 +112,18 @@ async def stop_workout(message: types.Message, state: FSMContext):
 @dp.message(Command("last"))
 async def cmd_last(message: types.Message):
     user_id = message.from_user.id
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-    c.execute(
-        "SELECT id, started_at FROM training_sessions WHERE user_id = ? AND ended_at IS NOT NULL ORDER BY ended_at DESC LIMIT 1",
-        (user_id,))
-    session = c.fetchone()
+    session, exercises = await database.get_last_session(user_id)
     if not session:
         await message.answer("Ви ще не маєте завершених тренувань.\nНатисніть 'Старт', щоб почати перше тренування.")
-        conn.close()
         return
 
-    c.execute('''SELECT e.name, ee.reps, ee.weight
-                 FROM exercise_entries ee
-                 JOIN exercises e ON ee.exercise_id = e.id
-                 WHERE ee.session_id = ?
-                 ORDER BY e.name, ee.timestamp''', (session[0],))
-    exercises = c.fetchall()
-    conn.close()
-
     if not exercises:
         await message.answer("Останнє тренування не містить вправ.")
     else:
         session_date = datetime.fromisoformat(session[1]).strftime("%d.%m.%Y %H:%M")
-        summary = f"📊 Останнє тренування ({session_date}):\n"
         formatted_exercises = format_exercise_summary(exercises)
-        summary += "\n".join(formatted_exercises)
-        await message.answer(summary)
+        for chunk in split_message(f"📊 Останнє тренування ({session_date}):", formatted_exercises):
+            await message.answer(chunk)
 
 
 def get_approach_word(count):
@@ -150,27 +138,7 @@ def get_approach_word(count):
 @dp.message(Command("stats"))
 async def cmd_stats(message: types.Message):
     user_id = message.from_user.id
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-
-    c.execute("SELECT COUNT(*) FROM training_sessions WHERE user_id = ? AND ended_at IS NOT NULL", (user_id,))
-    session_count = c.fetchone()[0]
-
-    c.execute(
-        "SELECT COUNT(*) FROM exercise_entries WHERE session_id IN (SELECT id FROM training_sessions WHERE user_id = ?)",
-        (user_id,))
-    exercise_count = c.fetchone()[0]
-
-    c.execute('''SELECT e.name, COUNT(*) as count, SUM(ee.reps) as total_reps
-                 FROM exercise_entries ee
-                 JOIN exercises e ON ee.exercise_id = e.id
-                 WHERE ee.session_id IN (SELECT id FROM training_sessions WHERE user_id = ?)
-                 GROUP BY e.name
-                 ORDER BY count DESC
-                 LIMIT 3''', (user_id,))
-    top_exercises = c.fetchall()
-
-    conn.close()
+    session_count, exercise_count, top_exercises = await database.get_user_stats(user_id)
 
     if session_count == 0:
         await message.answer("Ви ще не маєте завершених тренувань.\nНатисніть 'Старт', щоб почати перше тренування.")
@@ -189,6 +157,39 @@ async def cmd_stats(message: types.Message):
     await message.answer(response)
 
 
+@dp.message(Command("profile"), F.from_user.id.in_(ADMIN_IDS))
+async def cmd_profile(message: types.Message):
+    """
+    /profile [секунди] — профіль CPU процесу, що обробив команду; /profile on|off — журнал повільних
+    оновлень і блокувань event loop. Для інших користувачів команди не існує
+    """
+    argument = (message.text.split(maxsplit=1)[1:] or [""])[0].strip().lower()
+    if argument == "on":
+        profiling.enable()
+        await message.answer("Журнал повільних оновлень і блокувань event loop увімкнено")
+        return
+    if argument == "off":
+        profiling.disable()
+        await message.answer("Журнал повільних оновлень і блокувань event loop вимкнено")
+        return
+
+    try:
+        seconds = float(argument) if argument else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        await message.answer("Використання: /profile [секунди] або /profile on|off")
+        return
+    seconds = min(max(seconds, 1.0), PROFILE_MAX_SECONDS)
+
+    await message.answer(f"⏱ Профілюю {seconds:g} с...")
+    try:
+        path, report = await profiling.capture_profile(seconds)
+    except RuntimeError as e:
+        await message.answer(f"Не вдалося зняти профіль: {e}")
+        return
+    for chunk in split_message(f"Профіль збережено: {path}", report.strip().splitlines()):
+        await message.answer(chunk)
+
+
 @dp.message(F.voice)
 async def process_voice_message(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
@@ -198,27 +199,43 @@ async def process_voice_message(message: types.Message, state: FSMContext):
         await message.answer("Щоб надсилати вправи, спершу натисніть кнопку Старт")
         return
 
-    session_id = get_active_session(user_id)
+    session_id = database.get_active_session(user_id)
     if not session_id:
         await message.answer("Щоб надсилати вправи, спершу натисніть кнопку Старт")
         await state.clear()
         return
 
+    if message.voice.duration > VOICE_MAX_DURATION:
+        await message.answer(f"Голосове повідомлення задовге (максимум {VOICE_MAX_DURATION} с).\n"
+                             "Надішліть коротше повідомлення або вправу текстом.")
+        return
+    if (message.voice.file_size or 0) > VOICE_MAX_BYTES:
+        await message.answer(f"Файл голосового повідомлення завеликий (максимум {VOICE_MAX_BYTES // 1024} КБ).\n"
+                             "Надішліть коротше повідомлення або вправу текстом.")
+        return
+
+    # Обмеження голосу діє лише тут, коли повідомлення справді піде на завантаження і розпізнавання
+    reason = admission.voice.try_acquire(user_id)
+    if reason is not None:
+        await message.answer(admission.VOICE_OVERLOADED if reason == "overload" else admission.VOICE_TOO_FREQUENT)
+        return
+
     try:
         processing_message = await message.answer("🎤 Обробляю голосове повідомлення...")
 
         voice_file = await bot.get_file(message.voice.file_id)
 
-        temp_dir = tempfile.gettempdir()
-        temp_file_path = os.path.join(temp_dir, f"voice_{message.voice.file_id}.ogg")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://api.telegram.org/file/bot{TELEGRAM_TOKEN}/{voice_file.file_path}") as resp:
-                async with aiofiles.open(temp_file_path, 'wb') as f:
-                    async for chunk in resp.content.iter_chunked(1024):
-                        await f.write(chunk)
+        # Завантажуємо аудіо в пам'ять спільним HTTP-клієнтом, без тимчасових файлів
+        voice_data = await http_client.download(http_client.telegram_file_url(voice_file.file_path),
+                                                VOICE_MAX_BYTES)
 
-        recognized_text = await recognize_voice(temp_file_path)
+        try:
+            recognized_text = await recognize_voice(voice_data, user_id)
+        except VoiceQueueFull:
+            await processing_message.delete()
+            await message.answer("Зараз забагато голосових повідомлень у черзі.\n"
+                                 "Спробуйте трохи пізніше або надішліть вправу текстом.")
+            return
 
         await processing_message.delete()
 
@@ -229,7 +246,7 @@ async def process_voice_message(message: types.Message, state: FSMContext):
 
         await message.answer(f"🎯 Розпізнано: \"{recognized_text}\"")
 
-        exercise_data = parse_exercise(recognized_text)
+        exercise_data = await parse_exercise(recognized_text)
         if not exercise_data or 'name' not in exercise_data or 'reps' not in exercise_data:
             await message.answer(
                 "Повідомлення не схоже на опис вправи.\n"
@@ -240,14 +257,8 @@ async def process_voice_message(message: types.Message, state: FSMContext):
             )
             return
 
-        exercise_id = get_or_create_exercise_id(exercise_data['name'])
-        conn = sqlite3.connect("workouts.db")
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO exercise_entries (session_id, exercise_id, reps, weight, timestamp) VALUES (?, ?, ?, ?, ?)",
-            (session_id, exercise_id, exercise_data['reps'], exercise_data.get('weight'), datetime.now()))
-        conn.commit()
-        conn.close()
+        await database.add_exercise_entry(user_id, session_id, exercise_data['name'], exercise_data['reps'],
+                                          exercise_data.get('weight'))
 
         await message.answer(f"✅ Записано: {exercise_data['name']} – {exercise_data['reps']} повторів" +
                              (f" з вагою {exercise_data['weight']} кг" if exercise_data.get('weight') else ""))
@@ -255,19 +266,21 @@ async def process_voice_message(message: types.Message, state: FSMContext):
     except Exception as e:
         print(f"Помилка обробки голосового повідомлення: {e}")
         await message.answer("Не вдалося розпізнати голосове повідомлення.\nСпробуйте ще раз або надішліть текстом.")
+    finally:
+        admission.voice.release()
 
 
 @dp.message(WorkoutState.ACTIVE, F.text & ~F.text.in_(["Старт", "Стоп"]))
 async def process_exercise_text(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
-    session_id = get_active_session(user_id)
+    session_id = database.get_active_session(user_id)
 
     if not session_id:
         await message.answer("Щоб надсилати вправи, спершу натисніть кнопку Старт")
         await state.clear()  # Скидаємо стан якщо сесії немає
         return
 
-    exercise_data = parse_exercise(message.text)
+    exercise_data = await parse_exercise(message.text)
     if not exercise_data or 'name' not in exercise_data or 'reps' not in exercise_data:
         await message.answer(
             "Повідомлення не схоже на опис вправи.\n"
@@ -278,13 +291,8 @@ async def process_exercise_text(message: types.Message, state: FSMContext):
         )
         return
 
-    exercise_id = get_or_create_exercise_id(exercise_data['name'])
-    conn = sqlite3.connect("workouts.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO exercise_entries (session_id, exercise_id, reps, weight, timestamp) VALUES (?, ?, ?, ?, ?)",
-              (session_id, exercise_id, exercise_data['reps'], exercise_data.get('weight'), datetime.now()))
-    conn.commit()
-    conn.close()
+    await database.add_exercise_entry(user_id, session_id, exercise_data['name'], exercise_data['reps'],
+                                      exercise_data.get('weight'))
 
     await message.answer(f"✅ Записано: {exercise_data['name']} – {exercise_data['reps']} повторів" +
                          (f" з вагою {exercise_data['weight']} кг" if exercise_data.get('weight') else ""))
@@ -0,0 +1,53 @@
+import time
+
+import aiohttp
+
+import metrics
+import profiling
+from config import (HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT, HTTP_TIMEOUT,
+                    HTTP_CHUNK_SIZE, TELEGRAM_FILE_URL, TELEGRAM_TOKEN)
+
+# Єдина сесія aiohttp на весь застосунок: з'єднання з api.telegram.org перевикористовуються (keep-alive)
+_session = None
+
+
+async def start():
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT, limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                                         keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+    return _session
+
+
+async def close():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def telegram_file_url(file_path):
+    return TELEGRAM_FILE_URL.format(token=TELEGRAM_TOKEN, file_path=file_path)
+
+
+@profiling.staged("download")
+async def download(url, max_bytes=None):
+    """Завантажує файл у пам'ять спільною сесією. Кидає ValueError, якщо файл більший за max_bytes"""
+    session = await start()
+    started = time.perf_counter()
+    data = bytearray()
+    try:
+        async with session.get(url) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.content.iter_chunked(HTTP_CHUNK_SIZE):
+                data += chunk
+                if max_bytes is not None and len(data) > max_bytes:
+                    raise ValueError(f"файл перевищує {max_bytes} байт")
+    except Exception:
+        metrics.incr("download_errors")
+        raise
+    finally:
+        metrics.latency("telegram_download").observe(time.perf_counter() - started)
+    metrics.incr("download_bytes", len(data))
+    return bytes(data)
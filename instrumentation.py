@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+import metrics
+
+
+async def handler_timer_middleware(handler, event, data):
+    """Внутрішній middleware: гістограма часу та помилки для кожного обробника окремо"""
+    name = data["handler"].callback.__name__
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    except Exception:
+        metrics.incr(metrics.labeled("handler_errors", handler=name))
+        raise
+    finally:
+        metrics.latency(metrics.labeled("handler", handler=name)).observe(time.perf_counter() - started)
+
+
+async def telegram_api_middleware(make_request, bot, method):
+    """Middleware сесії Bot API: час кожного запиту за назвою методу"""
+    stats = metrics.latency(metrics.labeled("telegram_api", method=type(method).__name__))
+    with stats.time():
+        return await make_request(bot, method)
+
+
+async def monitor_event_loop(interval):
+    """Періодично вимірює, наскільки пізніше запланованого прокидається event loop"""
+    loop = asyncio.get_running_loop()
+    stats = metrics.latency("event_loop_lag")
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        stats.observe(lag)
+        metrics.set_gauge("event_loop_lag_last_seconds", round(lag, 6))
+
+
+def setup(dp, bot):
+    dp.message.middleware(handler_timer_middleware)
+    bot.session.middleware(telegram_api_middleware)
+
+
+def render_local():
+    return metrics.render_prometheus([(metrics.snapshot(buckets=True), "")])
+
+
+class MetricsServer:
+    """HTTP-ендпоінт GET /metrics у текстовому форматі Prometheus; render() повертає текст"""
+
+    def __init__(self, render=render_local):
+        self.render = render
+        self.port = None
+        self._runner = None
+
+    async def _metrics(self, request):
+        return web.Response(body=self.render().encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def start(self, host, port):
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        self._runner = web.AppRunner(app, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        print(f"Метрики доступні на http://{host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,24 +1,151 @@
+import time
+
+# Відлік часу запуску — до важких імпортів (aiogram, genai, pydub)
+PROCESS_STARTED = time.perf_counter()
+
 import asyncio
+import json
 import signal
 import sys
-from config import bot
+from datetime import datetime
+from config import (bot, STARTUP_LOG, VOICE_DRAIN_TIMEOUT, RUN_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST,
+                    WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_ALLOW_INSECURE, WEBHOOK_SHUTDOWN_TIMEOUT,
+                    POLLING_SHUTDOWN_TIMEOUT, WORKERS, METRICS_HOST, METRICS_PORT, LOOP_LAG_INTERVAL)
 from handlers import dp
+from services import voice_pool, stt_backend, start_gemini_selection
+import database
+import http_client
+import instrumentation
+import metrics
+import profiling
+from webhook import WebhookServer, require_secret
+
+_first_update_seen = False
+_loop = None
+_stopping = False
+_stop_event = None
+
+
+def record_startup(stage):
+    """Фіксує час від старту процесу до етапу запуску в метриках і журналі STARTUP_LOG"""
+    seconds = time.perf_counter() - PROCESS_STARTED
+    metrics.set_gauge(f"startup_{stage}_seconds", seconds)
+    print(f"Час запуску ({stage}): {seconds:.3f} с")
+    try:
+        with open(STARTUP_LOG, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"at": datetime.now().isoformat(), "stage": stage, "seconds": round(seconds, 4)}) + "\n")
+    except OSError as e:
+        print(f"Не вдалося записати час запуску: {e}")
+
+
+@dp.update.outer_middleware()
+async def startup_timer_middleware(handler, event, data):
+    global _first_update_seen
+    if not _first_update_seen:
+        _first_update_seen = True
+        record_startup("first_update")
+    return await handler(event, data)
+
+
+async def run_webhook():
+    """Приймає оновлення через webhook до сигналу зупинки, потім дочікується обробників"""
+    require_secret(WEBHOOK_SECRET, WEBHOOK_ALLOW_INSECURE)
+    server = WebhookServer(dp, bot, WEBHOOK_PATH, WEBHOOK_SECRET)
+    await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+    try:
+        if WEBHOOK_URL:
+            # Оновлення, що накопичились під час перезапуску, не відкидаються
+            await bot.set_webhook(WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET,
+                                  allowed_updates=dp.resolve_used_update_types(), drop_pending_updates=False)
+        record_startup("webhook")
+        await _stop_event.wait()
+    finally:
+        await server.stop(WEBHOOK_SHUTDOWN_TIMEOUT)
+
+
+async def wait_polling_handlers(timeout):
+    """
+    start_polling повертається, не чекаючи обробників, запущених окремими задачами:
+    дочікуємося їх (не довше timeout секунд), перш ніж закривати пули, HTTP-клієнт і базу
+    """
+    # Задачі, створені останнім отриманим пакетом оновлень, мають встигнути почати feed_update
+    await asyncio.sleep(0)
+    tasks = set(dp.update_tasks)
+    if not tasks:
+        return
+    print(f"Очікування обробки {len(tasks)} оновлень...")
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    if pending:
+        print(f"Не дочекалися {len(pending)} оновлень, скасовуємо")
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
 
 async def main():
     """Основна функція запуску бота"""
+    global _loop, _stop_event
+    _loop = asyncio.get_running_loop()
+    _stop_event = asyncio.Event()
+    metrics_server = instrumentation.MetricsServer()
+    lag_monitor = None
     try:
         print("Запуск бота...")
-        await dp.start_polling(bot, skip_updates=True)
+        await database.warm_exercise_cache()
+        await database.load_active_sessions()
+        await http_client.start()
+        instrumentation.setup(dp, bot)
+        profiling.setup(dp)
+        lag_monitor = asyncio.create_task(instrumentation.monitor_event_loop(LOOP_LAG_INTERVAL))
+        if METRICS_PORT:
+            await metrics_server.start(METRICS_HOST, METRICS_PORT)
+        # Модель розпізнавання завантажується у фоні, не затримуючи початок polling
+        _loop.run_in_executor(None, stt_backend.ensure_loaded)
+        # Так само у фоні обирається модель Gemini: до її вибору парсинг лише локальний
+        start_gemini_selection()
+        if RUN_MODE == "webhook":
+            await run_webhook()
+        else:
+            record_startup("polling")
+            # Сигнали обробляє signal_handler, щоб перед виходом дочекатися голосових повідомлень
+            await dp.start_polling(bot, skip_updates=True, handle_signals=False)
     except Exception as e:
         print(f"Помилка при запуску бота: {e}")
     finally:
+        if RUN_MODE != "webhook":
+            await wait_polling_handlers(POLLING_SHUTDOWN_TIMEOUT)
+        await voice_pool.drain(VOICE_DRAIN_TIMEOUT)
+        await http_client.close()
+        # Стани FSM зберігаються через пул, тому до його закриття
+        await dp.storage.close()
+        await database.close()
         await bot.session.close()
+        await metrics_server.stop()
+        if lag_monitor is not None:
+            lag_monitor.cancel()
+        profiling.disable()
+
+
+async def stop_polling():
+    if RUN_MODE == "webhook":
+        _stop_event.set()
+        return
+    try:
+        await dp.stop_polling()
+    except RuntimeError:
+        # Polling ще не запущено
+        sys.exit(0)
 
 
 def signal_handler(sig, frame):
-    """Обробник сигналу для коректного завершення"""
+    """Обробник сигналу для коректного завершення: зупиняє polling або webhook, після чого main() дочікується обробки"""
+    global _stopping
+    if _stopping or _loop is None or not _loop.is_running():
+        print("\nПримусова зупинка бота...")
+        sys.exit(0)
+    _stopping = True
     print("\nЗупинка бота...")
-    sys.exit(0)
+    _loop.call_soon_threadsafe(lambda: asyncio.ensure_future(stop_polling()))
 
 
 if __name__ == '__main__':
@@ -26,10 +153,14 @@ if __name__ == '__main__':
     signal.signal(signal.SIGTERM, signal_handler)
 
     try:
-        asyncio.run(main())
+        if WORKERS > 1:
+            import supervisor
+            supervisor.run(WORKERS)
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("\nБот зупинено користувачем")
     except Exception as e:
         print(f"Критична помилка: {e}")
     finally:
-        print("Програма завершена")
\ No newline at end of file
+        print("Програма завершена")
@@ -0,0 +1,161 @@
+import bisect
+import re
+import time
+from contextlib import contextmanager
+
+# Верхні межі кошиків гістограми часу, секунди
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Бенчмарки вмикають збереження кожного виміру, щоб рахувати точні перцентилі, а не лише гістограму
+keep_samples = False
+
+
+class LatencyStats:
+    """Накопичує кількість, суму, максимум і гістограму вимірів часу (у секундах)"""
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.samples = []
+
+    def observe(self, seconds):
+        if keep_samples:
+            self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = bisect.bisect_left(self.buckets, seconds)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self, buckets=False):
+        avg = self.total / self.count if self.count else 0.0
+        result = {
+            "count": self.count,
+            "avg_ms": round(avg * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "total_ms": round(self.total * 1000, 3),
+        }
+        if buckets:
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets, self.bucket_counts):
+                running += count
+                cumulative.append((bound, running))
+            result["sum_seconds"] = self.total
+            result["buckets"] = cumulative
+        return result
+
+
+_latencies = {}
+_counters = {}
+_gauges = {}
+
+
+def labeled(name, **labels):
+    """Назва ряду з мітками у форматі Prometheus: labeled("handler", handler="cmd_stats")"""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+def latency(name):
+    """Повертає (або створює) іменований вимірювач часу"""
+    stats = _latencies.get(name)
+    if stats is None:
+        stats = _latencies[name] = LatencyStats(name)
+    return stats
+
+
+def latency_series(name):
+    """Усі вимірювачі ряду name з будь-якими мітками: {назва з мітками: LatencyStats}"""
+    return {key: stats for key, stats in _latencies.items() if key == name or key.startswith(name + "{")}
+
+
+def incr(name, value=1):
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def counter(name):
+    return _counters.get(name, 0)
+
+
+def set_gauge(name, value):
+    _gauges[name] = value
+
+
+def gauge(name):
+    return _gauges.get(name)
+
+
+def snapshot(buckets=False):
+    """Знімок усіх лічильників та вимірів часу (buckets=True — разом із гістограмами)"""
+    return {
+        "latency": {name: stats.snapshot(buckets) for name, stats in _latencies.items()},
+        "counters": dict(_counters),
+        "gauges": dict(_gauges),
+    }
+
+
+def _split_series(series):
+    name, _, labels = series.partition("{")
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name), labels.rstrip("}")
+
+
+def _format_series(name, labels, extra_labels, more=""):
+    parts = [part for part in (extra_labels, labels, more) if part]
+    return f"{name}{{{','.join(parts)}}}" if parts else name
+
+
+def render_prometheus(sources, prefix="workout_bot"):
+    """
+    Текстовий формат Prometheus. sources — список (знімок snapshot(buckets=True), мітки), де мітки
+    додаються до кожного ряду знімка (наприклад, 'worker="0"'). Виміри часу — гістограми *_seconds,
+    лічильники — *_total, показники — як є
+    """
+    families = {}
+
+    def family(name, kind):
+        return families.setdefault(name, (kind, []))[1]
+
+    for data, extra_labels in sources:
+        for series, stats in data["latency"].items():
+            base, labels = _split_series(series)
+            name = f"{prefix}_{base}_seconds"
+            lines = family(name, "histogram")
+            for bound, count in stats.get("buckets", []) + [("+Inf", stats["count"])]:
+                bucket = _format_series(name + "_bucket", labels, extra_labels, 'le="%s"' % bound)
+                lines.append(f"{bucket} {count}")
+            lines.append(f"{_format_series(name + '_sum', labels, extra_labels)} "
+                         f"{stats.get('sum_seconds', stats['total_ms'] / 1000)}")
+            lines.append(f"{_format_series(name + '_count', labels, extra_labels)} {stats['count']}")
+
+        for series, value in data["counters"].items():
+            base, labels = _split_series(series)
+            name = f"{prefix}_{base}_total"
+            family(name, "counter").append(f"{_format_series(name, labels, extra_labels)} {value}")
+
+        for series, value in data["gauges"].items():
+            if not isinstance(value, (int, float)):
+                continue
+            base, labels = _split_series(series)
+            name = f"{prefix}_{base}"
+            family(name, "gauge").append(f"{_format_series(name, labels, extra_labels)} {value}")
+
+    output = []
+    for name, (kind, lines) in sorted(families.items()):
+        output.append(f"# TYPE {name} {kind}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
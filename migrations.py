@@ -0,0 +1,144 @@
+import sys
+
+from rollups import REBUILD_SQL
+
+# Кожна міграція — (версія, список SQL-інструкцій). Поточна версія схеми зберігається в PRAGMA user_version.
+MIGRATIONS = [
+    (1, [
+        '''CREATE TABLE IF NOT EXISTS training_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            started_at DATETIME NOT NULL,
+            ended_at DATETIME
+        )''',
+        '''CREATE TABLE IF NOT EXISTS exercises (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS exercise_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            exercise_id INTEGER NOT NULL,
+            reps INTEGER NOT NULL,
+            weight INTEGER,
+            timestamp DATETIME NOT NULL,
+            FOREIGN KEY (session_id) REFERENCES training_sessions(id),
+            FOREIGN KEY (exercise_id) REFERENCES exercises(id)
+        )''',
+    ]),
+    (2, [
+        # Активна сесія користувача: user_id = ? AND ended_at IS NULL
+        '''CREATE INDEX IF NOT EXISTS idx_sessions_active
+           ON training_sessions(user_id, ended_at) WHERE ended_at IS NULL''',
+        # /last та /stats: завершені сесії користувача, впорядковані за ended_at
+        '''CREATE INDEX IF NOT EXISTS idx_sessions_finished
+           ON training_sessions(user_id, ended_at, started_at) WHERE ended_at IS NOT NULL''',
+        # session_id IN (SELECT id FROM training_sessions WHERE user_id = ?)
+        '''CREATE INDEX IF NOT EXISTS idx_sessions_user
+           ON training_sessions(user_id)''',
+        # Записи сесії: покриваючий індекс для WHERE session_id = ? ORDER BY timestamp
+        '''CREATE INDEX IF NOT EXISTS idx_entries_session
+           ON exercise_entries(session_id, timestamp, exercise_id, reps, weight)''',
+    ]),
+    (3, [
+        # Кеш результатів парсингу: нормалізований текст -> JSON, з версією промпту
+        '''CREATE TABLE IF NOT EXISTS parse_cache (
+            key TEXT NOT NULL,
+            version TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (key, version)
+        ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS idx_parse_cache_created
+           ON parse_cache(created_at)''',
+    ]),
+    (4, [
+        # Зведення для /stats, що оновлюються разом із записами підходів і закриттям сесій
+        '''CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            entry_count INTEGER NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_exercise_stats (
+            user_id INTEGER NOT NULL,
+            exercise_id INTEGER NOT NULL,
+            sets INTEGER NOT NULL,
+            reps INTEGER NOT NULL,
+            PRIMARY KEY (user_id, exercise_id)
+        ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS idx_user_exercise_stats_top
+           ON user_exercise_stats(user_id, sets DESC)''',
+    ] + REBUILD_SQL),
+    (5, [
+        # Стани FSM aiogram: ключ сховища -> стан і JSON-дані
+        '''CREATE TABLE IF NOT EXISTS fsm_state (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID''',
+    ]),
+    (6, [
+        # Перерахунок v4 створював нульові рядки для користувачів лише з відкритою сесією,
+        # яких інкрементальне оновлення не створює, і rollups.verify вважав їх розбіжністю
+        "DELETE FROM user_stats WHERE session_count = 0 AND entry_count = 0",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Застосовує всі міграції, новіші за поточну версію схеми. Повертає список застосованих версій"""
+    current = get_version(conn)
+    applied = []
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+        applied.append(version)
+        print(f"Застосовано міграцію бази даних до версії {version}")
+    return applied
+
+
+def check_query_plans(conn, queries):
+    """
+    Перевіряє через EXPLAIN QUERY PLAN, що гарячі запити використовують очікувані індекси.
+    queries: словник name -> (sql, params, expected_index)
+    Повертає список (name, plan, ok)
+    """
+    results = []
+    for name, (sql, params, expected_index) in queries.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        full_scan = any(line.startswith("SCAN") and "INDEX" not in line for line in plan)
+        uses_index = any(expected_index in line for line in plan)
+        results.append((name, plan, uses_index and not full_scan))
+    return results
+
+
+def main():
+    import database
+
+    conn = database.connect()
+    migrate(conn)
+    print(f"Версія схеми: {get_version(conn)}")
+
+    failed = False
+    for name, plan, ok in check_query_plans(conn, database.HOT_QUERIES):
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+        for line in plan:
+            print(f"      {line}")
+        failed = failed or not ok
+    conn.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import re
+import time
+
+import database
+from cache import LRUCache
+
+NOT_EXERCISE = "not_exercise"
+
+# Як часто (кожні N записів) видаляти застарілі та зайві рядки з таблиці
+PRUNE_EVERY = 500
+
+
+def normalize(text):
+    """Нормалізує текст повідомлення для ключа кешу: регістр, пробіли, кінцева пунктуація"""
+    text = re.sub(r'\s+', ' ', text.lower()).strip()
+    return text.strip(' .,!?;:')
+
+
+def prompt_version(prompt):
+    """Версія кешу, прив'язана до тексту промпту: зміна промпту інвалідує старі записи"""
+    return hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]
+
+
+def _select(conn, key, version, min_created):
+    return conn.execute(
+        "SELECT result, created_at FROM parse_cache WHERE key = ? AND version = ? AND created_at >= ?",
+        (key, version, min_created)).fetchone()
+
+
+def _upsert(conn, key, version, result, created_at):
+    conn.execute(
+        "INSERT OR REPLACE INTO parse_cache (key, version, result, created_at) VALUES (?, ?, ?, ?)",
+        (key, version, result, created_at))
+
+
+def _prune(conn, version, min_created, max_rows):
+    conn.execute("DELETE FROM parse_cache WHERE version != ? OR created_at < ?", (version, min_created))
+    conn.execute('''DELETE FROM parse_cache WHERE created_at < (
+                        SELECT created_at FROM parse_cache ORDER BY created_at DESC LIMIT 1 OFFSET ?)''',
+                 (max_rows - 1,))
+
+
+class ParseCache:
+    """
+    Дворівневий кеш результатів парсингу: LRU у пам'яті перед таблицею parse_cache у SQLite.
+    Значення — dict вправи або NOT_EXERCISE
+    """
+
+    def __init__(self, version, memory_size, ttl, max_rows):
+        self.version = version
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = LRUCache(memory_size)
+        # Влучання в пам'ять рахуються лише для свіжих записів (LRUCache.hits враховує й застарілі)
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    async def get(self, text):
+        """Повертає збережений результат або None, якщо його немає чи він застарів"""
+        key = normalize(text)
+        now = time.time()
+        cached = self.memory.get(key)
+        if cached is not None:
+            value, created_at = cached
+            if created_at >= now - self.ttl:
+                self.memory_hits += 1
+                return value
+            self.memory.pop(key)
+
+        row = await database.pool.run(_select, key, self.version, now - self.ttl)
+        if row is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        result, created_at = row
+        value = json.loads(result)
+        value = NOT_EXERCISE if value.get('error') == NOT_EXERCISE else value
+        # Час створення з бази, а не поточний: читання не продовжує TTL запису
+        self.memory.put(key, (value, created_at))
+        return value
+
+    async def put(self, text, value):
+        key = normalize(text)
+        now = time.time()
+        self.memory.put(key, (value, now))
+        stored = {"error": NOT_EXERCISE} if value == NOT_EXERCISE else value
+        await database.pool.run(_upsert, key, self.version, json.dumps(stored, ensure_ascii=False), now)
+
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            await database.pool.run(_prune, self.version, now - self.ttl, self.max_rows)
+
+    def stats(self):
+        memory_hits = self.memory_hits
+        lookups = memory_hits + self.db_hits + self.misses
+        return {
+            "version": self.version,
+            "memory": self.memory.stats(),
+            "memory_hits": memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round((memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,177 @@
+"""
+Профілювання живого процесу. Вмикається змінною PROFILING_ENABLED або командою адміністратора /profile.
+
+- capture_profile(seconds): cProfile потоку event loop протягом заданого часу, результат у PROFILE_DIR
+- повільні оновлення (довші за SLOW_UPDATE_MS) журналюються з розбивкою за етапами (parse, db, stt, download)
+- сторожовий потік повідомляє, коли event loop заблоковано довше за LOOP_BLOCK_MS, зі стеком блокуючого коду
+
+Коли профілювання вимкнено, middleware лише перевіряє прапорець, а stage() — змінну контексту
+"""
+import asyncio
+import contextvars
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+
+import metrics
+from config import PROFILING_ENABLED, PROFILE_DIR, SLOW_UPDATE_MS, LOOP_BLOCK_MS
+
+# Етап -> накопичений час (с) для оновлення, що обробляється; None, коли журнал повільних оновлень вимкнено
+_stages = contextvars.ContextVar("profile_stages", default=None)
+
+enabled = False
+_watchdog = None
+_profile_lock = asyncio.Lock()
+
+
+@contextmanager
+def stage(name):
+    """Додає час блоку до етапу name поточного оновлення (включно з вкладеними етапами)"""
+    stages = _stages.get()
+    if stages is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - started
+
+
+def staged(name):
+    """Декоратор корутини: увесь її час зараховується до етапу name"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def slow_update_middleware(handler, event, data):
+    """Зовнішній middleware оновлень: журналює оновлення, довші за SLOW_UPDATE_MS, з розбивкою за етапами"""
+    if not enabled:
+        return await handler(event, data)
+
+    stages = {}
+    token = _stages.set(stages)
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        _stages.reset(token)
+        elapsed = time.perf_counter() - started
+        if elapsed * 1000 >= SLOW_UPDATE_MS:
+            metrics.incr("slow_updates")
+            breakdown = ", ".join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in
+                                  sorted(stages.items(), key=lambda item: item[1], reverse=True))
+            print(f"Повільне оновлення {event.update_id} ({event.event_type}): {elapsed * 1000:.0f} мс"
+                  + (f" — {breakdown}" if breakdown else ""))
+
+
+class LoopWatchdog:
+    """
+    Event loop щоінтервалу оновлює мітку часу; окремий потік перевіряє її і, якщо loop не відповідає
+    довше за threshold, друкує стек потоку loop — тобто код, що його блокує
+    """
+
+    def __init__(self, loop, threshold):
+        self.loop = loop
+        self.threshold = threshold
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._handle = None
+        self._thread = None
+
+    def _beat(self):
+        self._heartbeat = time.monotonic()
+        self._handle = self.loop.call_later(self.threshold / 4, self._beat)
+
+    def _watch(self):
+        reported = None
+        while not self._stop.wait(self.threshold / 4):
+            blocked = time.monotonic() - self._heartbeat
+            if blocked < self.threshold:
+                reported = None
+                continue
+            if reported == self._heartbeat:
+                continue
+            # Одне повідомлення на кожне блокування
+            reported = self._heartbeat
+            metrics.incr("loop_blocks")
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=8)) if frame else ""
+            print(f"Event loop заблоковано понад {blocked * 1000:.0f} мс:\n{stack}")
+
+    def start(self):
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+
+
+def enable():
+    """Вмикає журнал повільних оновлень і сторожа event loop (викликати з event loop)"""
+    global enabled, _watchdog
+    enabled = True
+    if _watchdog is None:
+        _watchdog = LoopWatchdog(asyncio.get_running_loop(), LOOP_BLOCK_MS / 1000)
+        _watchdog.start()
+
+
+def disable():
+    global enabled, _watchdog
+    enabled = False
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
+
+
+def _dump(profile, path, top):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    profile.dump_stats(path)
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(top)
+    return output.getvalue()
+
+
+async def capture_profile(seconds, top=15):
+    """
+    Профілює потік event loop протягом seconds секунд і зберігає результат (формат pstats) у PROFILE_DIR.
+    Повертає (шлях, текстовий звіт з top функціями за сукупним часом). Одночасно — лише один профіль
+    """
+    if _profile_lock.locked():
+        raise RuntimeError("профілювання вже триває")
+    async with _profile_lock:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        path = os.path.join(PROFILE_DIR, f"profile-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(None, _dump, profile, path, top)
+        metrics.incr("profiles_captured")
+        print(f"Профіль CPU ({seconds} с) збережено: {path}")
+        return path, report
+
+
+def setup(dp):
+    dp.update.outer_middleware(slow_update_middleware)
+    if PROFILING_ENABLED:
+        enable()
@@ -0,0 +1,94 @@
+import sys
+
+# Перерахунок зведених таблиць /stats з повної історії. Як і record_entry / record_closed_sessions,
+# рядок user_stats з'являється лише з першою закритою сесією або першим підходом, а не з відкриттям сесії
+REBUILD_SQL = [
+    "DELETE FROM user_stats",
+    "DELETE FROM user_exercise_stats",
+    '''INSERT INTO user_stats (user_id, session_count, entry_count)
+       SELECT ts.user_id,
+              SUM(CASE WHEN ts.ended_at IS NOT NULL THEN 1 ELSE 0 END),
+              COALESCE(SUM(entries.count), 0)
+       FROM training_sessions ts
+       LEFT JOIN (SELECT session_id, COUNT(*) AS count FROM exercise_entries GROUP BY session_id) entries
+              ON entries.session_id = ts.id
+       GROUP BY ts.user_id
+       HAVING SUM(CASE WHEN ts.ended_at IS NOT NULL THEN 1 ELSE 0 END) > 0
+           OR COALESCE(SUM(entries.count), 0) > 0''',
+    '''INSERT INTO user_exercise_stats (user_id, exercise_id, sets, reps)
+       SELECT ts.user_id, ee.exercise_id, COUNT(*), SUM(ee.reps)
+       FROM exercise_entries ee
+       JOIN training_sessions ts ON ts.id = ee.session_id
+       GROUP BY ts.user_id, ee.exercise_id''',
+]
+
+ADD_ENTRY_SQL = [
+    '''INSERT INTO user_stats (user_id, entry_count) VALUES (?, 1)
+       ON CONFLICT(user_id) DO UPDATE SET entry_count = entry_count + 1''',
+    '''INSERT INTO user_exercise_stats (user_id, exercise_id, sets, reps) VALUES (?, ?, 1, ?)
+       ON CONFLICT(user_id, exercise_id) DO UPDATE SET sets = sets + 1, reps = reps + excluded.reps''',
+]
+
+CLOSE_SESSIONS_SQL = '''INSERT INTO user_stats (user_id, session_count) VALUES (?, ?)
+                        ON CONFLICT(user_id) DO UPDATE SET session_count = session_count + excluded.session_count'''
+
+
+def record_entry(conn, user_id, exercise_id, reps):
+    """Оновлює зведення в тій самій транзакції, що й вставка в exercise_entries"""
+    conn.execute(ADD_ENTRY_SQL[0], (user_id,))
+    conn.execute(ADD_ENTRY_SQL[1], (user_id, exercise_id, reps))
+
+
+def record_closed_sessions(conn, user_id, count):
+    """Оновлює зведення в тій самій транзакції, що й закриття сесій"""
+    if count:
+        conn.execute(CLOSE_SESSIONS_SQL, (user_id, count))
+
+
+def rebuild(conn):
+    with conn:
+        for statement in REBUILD_SQL:
+            conn.execute(statement)
+
+
+def verify(conn):
+    """Порівнює зведення з перерахунком з історії. Повертає відсортований список user_id з розбіжностями"""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS expected_user_stats AS SELECT * FROM user_stats WHERE 0")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS expected_user_exercise_stats AS SELECT * FROM user_exercise_stats WHERE 0")
+    conn.execute("DELETE FROM temp.expected_user_stats")
+    conn.execute("DELETE FROM temp.expected_user_exercise_stats")
+    for statement in REBUILD_SQL[2:]:
+        conn.execute(statement.replace("INSERT INTO user_", "INSERT INTO temp.expected_user_", 1))
+
+    mismatched = set()
+    for table in ("user_stats", "user_exercise_stats"):
+        for query in (f"SELECT * FROM main.{table} EXCEPT SELECT * FROM temp.expected_{table}",
+                      f"SELECT * FROM temp.expected_{table} EXCEPT SELECT * FROM main.{table}"):
+            mismatched.update(row[0] for row in conn.execute(query))
+    conn.rollback()
+    return sorted(mismatched)
+
+
+def main(command):
+    import database
+
+    conn = database.connect()
+    if command == "rebuild":
+        rebuild(conn)
+        print("Зведення статистики перераховано")
+        return 0
+
+    mismatched = verify(conn)
+    if mismatched:
+        print(f"Розбіжності у зведеннях для {len(mismatched)} користувачів: {mismatched[:20]}")
+        print("Виконайте `python rollups.py rebuild`")
+        return 1
+    print("Зведення статистики узгоджені з історією")
+    return 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in ("rebuild", "verify"):
+        print("Використання: python rollups.py rebuild|verify")
+        sys.exit(2)
+    sys.exit(main(sys.argv[1]))
@@ -1,83 +1,221 @@
+import asyncio
+import json
+import time
 import google.generativeai as genai
-import speech_recognition as sr
-from pydub import AudioSegment
-import os
-from config import GEMINI_API_KEY
+import metrics
+import profiling
+import stt
+from cache import LRUCache
+from config import (GEMINI_API_KEY, GEMINI_MODEL_CACHE, GEMINI_MODEL_CACHE_TTL, GEMINI_TIMEOUT, GEMINI_SELECT_BACKOFF,
+                    GEMINI_SELECT_BACKOFF_MAX, VOICE_QUEUE_SIZE, VOICE_WORKERS,
+                    VOICE_DECODE_THREADS, VOICE_RECOGNIZE_THREADS, STT_STRATEGY, STT_LANGUAGES,
+                    STT_MIN_CONFIDENCE, STT_PREFERRED_CACHE_SIZE, STT_BACKEND, STT_VOSK_MODELS)
+from voice_pool import VoicePool, VoiceQueueFull
 
-recognizer = sr.Recognizer()
+# Рушій розпізнавання мовлення: один екземпляр (і одна завантажена модель) на процес
+stt_backend = stt.create_backend(STT_BACKEND, STT_VOSK_MODELS)
+
+GEMINI_MODELS = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-pro']
+
+# Модель Gemini обирається у фоновій задачі, а не під час імпорту: бот починає приймати оновлення одразу,
+# парсинг до завершення вибору йде локально, а вибір кешується на диску між перезапусками
+_gemini_model = None
+_gemini_selected = False
+_gemini_task = None
+_gemini_retry_at = 0.0
+_gemini_backoff = GEMINI_SELECT_BACKOFF
+
+
+def _load_model_choice():
+    try:
+        with open(GEMINI_MODEL_CACHE, encoding='utf-8') as f:
+            choice = json.load(f)
+        if time.time() - choice['selected_at'] < GEMINI_MODEL_CACHE_TTL:
+            return choice['model']
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _save_model_choice(model_name):
+    try:
+        with open(GEMINI_MODEL_CACHE, 'w', encoding='utf-8') as f:
+            json.dump({"model": model_name, "selected_at": time.time()}, f)
+    except OSError as e:
+        print(f"Не вдалося зберегти вибір моделі Gemini: {e}")
+
+
+def select_gemini_model():
+    """Блокуюча функція: бере модель із кешу на диску або перевіряє моделі по черзі"""
+    try:
+        if not GEMINI_API_KEY:
+            print("GEMINI_API_KEY не знайдено, використовується лише локальний парсинг")
+            return None
 
-# Ініціалізуємо Gemini
-try:
-    if GEMINI_API_KEY:
         genai.configure(api_key=GEMINI_API_KEY)
 
-        models_to_try = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-pro']
-        gemini_model = None
+        cached_name = _load_model_choice()
+        if cached_name:
+            print(f"Gemini: використовується збережений вибір моделі {cached_name}")
+            return genai.GenerativeModel(cached_name)
 
-        for model_name in models_to_try:
+        for model_name in GEMINI_MODELS:
             try:
-                gemini_model = genai.GenerativeModel(model_name)
-                test_response = gemini_model.generate_content("test")
+                model = genai.GenerativeModel(model_name)
+                model.generate_content("test", request_options={"timeout": GEMINI_TIMEOUT})
                 print(f"Gemini API налаштовано успішно з моделлю: {model_name}")
-                break
+                _save_model_choice(model_name)
+                return model
             except Exception as model_error:
                 print(f"Модель {model_name} недоступна: {model_error}")
                 continue
 
-        if not gemini_model:
-            print("Не вдалося знайти робочу модель Gemini, використовується лише локальний парсинг")
+        print("Не вдалося знайти робочу модель Gemini, використовується лише локальний парсинг")
+    except Exception as e:
+        print(f"Помилка налаштування Gemini API: {e}")
+    return None
+
+
+async def _select_gemini_model():
+    global _gemini_model, _gemini_selected, _gemini_retry_at, _gemini_backoff
+    loop = asyncio.get_running_loop()
+    model = await loop.run_in_executor(None, select_gemini_model)
+    if model is not None or not GEMINI_API_KEY:
+        _gemini_model = model
+        _gemini_selected = True
+        return model
+    # Збій може бути тимчасовим: не фіксуємо None до перезапуску, а повторюємо вибір пізніше
+    metrics.incr("gemini_select_failures")
+    _gemini_retry_at = time.monotonic() + _gemini_backoff
+    print(f"Повторний вибір моделі Gemini через {_gemini_backoff:.0f} с")
+    _gemini_backoff = min(_gemini_backoff * 2, GEMINI_SELECT_BACKOFF_MAX)
+    return None
+
+
+def start_gemini_selection():
+    """Запускає вибір моделі у фоні, якщо він ще не триває і настав час (повторної) спроби"""
+    global _gemini_task
+    if _gemini_selected or (_gemini_task is not None and not _gemini_task.done()):
+        return _gemini_task
+    if _gemini_task is None or time.monotonic() >= _gemini_retry_at:
+        _gemini_task = asyncio.create_task(_select_gemini_model())
+    return _gemini_task
+
+
+async def get_gemini_model(timeout=None):
+    """
+    Повертає модель Gemini або None, поки модель не обрано. Чекає на вибір не довше timeout секунд:
+    сам вибір продовжується у фоні, а виклик, що не дочекався, парсить локально
+    """
+    if _gemini_selected:
+        return _gemini_model
+    task = start_gemini_selection()
+    if task.done():
+        return None
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        metrics.incr("gemini_select_pending")
+        return None
+
+
+# user_id -> мова, якою востаннє успішно розпізнано голос користувача
+preferred_languages = LRUCache(STT_PREFERRED_CACHE_SIZE)
+
+
+def recognize_language(audio, language):
+    """Блокуючий виклик розпізнавання однією мовою: повертає (текст, впевненість) або None"""
+    # Рахуються лише виклики, що справді почалися: скасована до старту спроба сюди не доходить
+    metrics.incr("stt_calls")
+    result = stt_backend.timed_recognize(*audio, language)
+    if result:
+        print(f"Розпізнавання {stt_backend.name} ({language}) результат: {result[0]} ({result[1]:.2f})")
+    return result
+
+
+async def _recognize_sequential(audio, languages, run):
+    # Мови по черзі: наступна лише якщо попередня нічого не розпізнала
+    for language in languages:
+        result = await run(recognize_language, audio, language)
+        if result:
+            return language, result
+    return None
+
+
+async def _recognize_concurrent(audio, languages, run, first_confident):
+    """
+    Усі мови одночасно. first_confident=True: перемагає перший результат з впевненістю не нижче
+    STT_MIN_CONFIDENCE, решта викликів скасовується; інакше — найвпевненіший з усіх результатів
+    """
+    async def attempt(language):
+        return language, await run(recognize_language, audio, language)
+
+    tasks = [asyncio.ensure_future(attempt(language)) for language in languages]
+    best = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            language, result = await next_done
+            if not result:
+                continue
+            if best is None or result[1] > best[1][1]:
+                best = (language, result)
+            if first_confident and result[1] >= STT_MIN_CONFIDENCE:
+                break
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                metrics.incr("stt_cancelled")
+    return best
+
+
+async def recognize_pcm(frame_data, sample_rate, sample_width, user_id, run):
+    """
+    Розпізнає моно PCM згідно з STT_STRATEGY. Спершу пробує мову, якою користувач говорив минулого разу:
+    здебільшого цього досить і потрібен лише один виклик. run(func, *args) виконує блокуючий виклик у потоці
+    """
+    audio = (frame_data, sample_rate, sample_width)
+    languages = list(STT_LANGUAGES)
+
+    preferred = preferred_languages.get(user_id) if user_id is not None else None
+    preferred_result = None
+    if preferred in languages:
+        result = await run(recognize_language, audio, preferred)
+        if result and result[1] >= STT_MIN_CONFIDENCE:
+            metrics.incr("stt_preferred_hits")
+            return result[0]
+        languages.remove(preferred)
+        # Невпевнений результат не відкидається: він лишається кандидатом поряд з іншими мовами
+        if result:
+            preferred_result = (preferred, result)
+
+    if STT_STRATEGY == "sequential":
+        winner = await _recognize_sequential(audio, languages, run)
     else:
-        gemini_model = None
-        print("GEMINI_API_KEY не знайдено, використовується лише локальний парсинг")
-except Exception as e:
-    print(f"Помилка налаштування Gemini API: {e}")
-    gemini_model = None
+        winner = await _recognize_concurrent(audio, languages, run, first_confident=STT_STRATEGY == "concurrent")
+    if preferred_result and (not winner or winner[1][1] < preferred_result[1][1]):
+        winner = preferred_result
+
+    if not winner:
+        return None
+    language, (text, _) = winner
+    if user_id is not None:
+        preferred_languages.put(user_id, language)
+    return text
+
+
+voice_pool = VoicePool(recognize_pcm, VOICE_QUEUE_SIZE, VOICE_WORKERS, VOICE_DECODE_THREADS,
+                       VOICE_RECOGNIZE_THREADS)
 
 
 # Функція для розпізнавання голосу
-async def recognize_voice(audio_file_path):
-    """Розпізнає голос з аудіофайлу та повертає текст"""
+@profiling.staged("stt")
+async def recognize_voice(voice_data, user_id=None):
+    """Розпізнає голос з байтів OGG та повертає текст. Кидає VoiceQueueFull, якщо черга заповнена"""
     try:
-        # Конвертуємо OGG у WAV
-        audio = AudioSegment.from_ogg(audio_file_path)
-        wav_path = audio_file_path.replace('.ogg', '.wav')
-        audio.export(wav_path, format="wav")
-
-        # Розпізнаємо голос
-        with sr.AudioFile(wav_path) as source:
-            audio_data = recognizer.record(source)
-
-        # Спробуємо різні сервіси розпізнавання
-        try:
-            text = recognizer.recognize_google(audio_data, language='uk-UA')
-            print(f"Google Speech Recognition результат: {text}")
-            return text
-        except sr.UnknownValueError:
-            try:
-                # Спробуємо з російською мовою як резерв
-                text = recognizer.recognize_google(audio_data, language='ru-RU')
-                print(f"Google Speech Recognition (ru) результат: {text}")
-                return text
-            except sr.UnknownValueError:
-                try:
-                    # Спробуємо з англійською як останній резерв
-                    text = recognizer.recognize_google(audio_data, language='en-US')
-                    print(f"Google Speech Recognition (en) результат: {text}")
-                    return text
-                except sr.UnknownValueError:
-                    return None
-        except sr.RequestError as e:
-            print(f"Помилка сервісу розпізнавання: {e}")
-            return None
-
+        return await voice_pool.submit(voice_data, user_id)
+    except VoiceQueueFull:
+        raise
     except Exception as e:
         print(f"Помилка розпізнавання голосу: {e}")
         return None
-    finally:
-        try:
-            if os.path.exists(audio_file_path):
-                os.remove(audio_file_path)
-            if 'wav_path' in locals() and os.path.exists(wav_path):
-                os.remove(wav_path)
-        except Exception as cleanup_error:
-            print(f"Помилка при видаленні тимчасових файлів: {cleanup_error}")
\ No newline at end of file
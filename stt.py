@@ -0,0 +1,152 @@
+import hashlib
+import json
+import threading
+import time
+
+import metrics
+
+
+class SttBackend:
+    """
+    Інтерфейс рушія розпізнавання мовлення. recognize — блокуючий виклик (виконується в потоці пулу голосу),
+    повертає (текст, впевненість 0..1) або None. Модель завантажується один раз на процес через ensure_loaded
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        pass
+
+    def ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                with metrics.latency(f"stt_{self.name}_load").time():
+                    self.load()
+                self._loaded = True
+
+    def recognize(self, frame_data, sample_rate, sample_width, language):
+        raise NotImplementedError
+
+    def timed_recognize(self, frame_data, sample_rate, sample_width, language):
+        self.ensure_loaded()
+        with metrics.latency(f"stt_{self.name}").time():
+            return self.recognize(frame_data, sample_rate, sample_width, language)
+
+
+class GoogleBackend(SttBackend):
+    """Google Web Speech API через speech_recognition (мережевий виклик на кожну спробу)"""
+
+    name = "google"
+
+    def load(self):
+        import speech_recognition as sr
+        self._sr = sr
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, frame_data, sample_rate, sample_width, language):
+        audio_data = self._sr.AudioData(frame_data, sample_rate, sample_width)
+        try:
+            response = self.recognizer.recognize_google(audio_data, language=language, show_all=True)
+        except self._sr.RequestError as e:
+            print(f"Помилка сервісу розпізнавання ({language}): {e}")
+            return None
+        if not response or not response.get('alternative'):
+            return None
+        best = response['alternative'][0]
+        # Google не завжди повертає впевненість — тоді вважаємо результат прийнятним
+        return best['transcript'], best.get('confidence', 1.0)
+
+
+class VoskBackend(SttBackend):
+    """
+    Офлайн-розпізнавання через Vosk. Моделі задаються як STT_VOSK_MODELS="uk-UA=/models/uk,en-US=/models/en";
+    мови без моделі пропускаються
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_paths):
+        super().__init__()
+        self.model_paths = model_paths
+        self.models = {}
+
+    def load(self):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("Для STT_BACKEND=vosk потрібен пакет vosk (pip install vosk)")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        for language, path in self.model_paths.items():
+            self.models[language] = vosk.Model(path)
+            print(f"Vosk: завантажено модель {language} з {path}")
+
+    def recognize(self, frame_data, sample_rate, sample_width, language):
+        model = self.models.get(language)
+        if model is None:
+            return None
+        recognizer = self._vosk.KaldiRecognizer(model, sample_rate)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(frame_data)
+        result = json.loads(recognizer.FinalResult())
+        text = result.get('text', '').strip()
+        if not text:
+            return None
+        words = result.get('result') or []
+        confidence = sum(word.get('conf', 0.0) for word in words) / len(words) if words else 0.0
+        return text, confidence
+
+
+class FakeBackend(SttBackend):
+    """
+    Детермінований рушій для бенчмарків і тестів без мережі: повертає заданий текст для аудіо
+    (за хешем PCM) або текст за замовчуванням — лише для своєї мови — після фіксованої затримки
+    """
+
+    name = "fake"
+
+    def __init__(self, text="присідання 20 разів", language="uk-UA", latency=0.05, confidence=0.95):
+        super().__init__()
+        self.text = text
+        self.language = language
+        self.latency = latency
+        self.confidence = confidence
+        self.responses = {}
+
+    @staticmethod
+    def audio_key(frame_data):
+        return hashlib.sha1(frame_data).hexdigest()
+
+    def add_response(self, frame_data, text):
+        self.responses[self.audio_key(frame_data)] = text
+
+    def recognize(self, frame_data, sample_rate, sample_width, language):
+        time.sleep(self.latency)
+        if language != self.language:
+            return None
+        text = self.responses.get(self.audio_key(frame_data), self.text)
+        return (text, self.confidence) if text else None
+
+
+def parse_model_paths(value):
+    paths = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        language, _, path = item.partition("=")
+        paths[language.strip()] = path.strip()
+    return paths
+
+
+def create_backend(name, vosk_models=""):
+    if name == "google":
+        return GoogleBackend()
+    if name == "vosk":
+        return VoskBackend(parse_model_paths(vosk_models))
+    if name == "fake":
+        return FakeBackend()
+    raise ValueError(f"Невідомий рушій розпізнавання мовлення: {name}")
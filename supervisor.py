@@ -0,0 +1,332 @@
+"""
+Режим кількох процесів: супервізор отримує оновлення (polling або webhook) і розподіляє їх між
+робочими процесами за консистентним хешем from_user.id. Усі оновлення одного користувача обробляє
+один процес, тож його стан FSM, кеш активної сесії та записи підходів не розходяться між процесами.
+Процеси ділять одну базу SQLite у режимі WAL.
+
+    WORKERS=4 python main.py
+"""
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import queue
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+import metrics
+import profiling
+from config import (bot, RUN_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET,
+                    WEBHOOK_ALLOW_INSECURE, WEBHOOK_SHUTDOWN_TIMEOUT, VOICE_DRAIN_TIMEOUT, SHARD_VNODES,
+                    WORKER_METRICS_INTERVAL, WORKER_STOP_TIMEOUT, WORKER_CHECK_INTERVAL, METRICS_HOST, METRICS_PORT, LOOP_LAG_INTERVAL)
+
+POLL_TIMEOUT = 30
+
+
+class HashRing:
+    """Консистентний хеш: зміна кількості процесів переносить лише ~1/N користувачів"""
+
+    def __init__(self, nodes, vnodes=SHARD_VNODES):
+        self.nodes = list(nodes)
+        points = sorted((self._hash(f"{node}-{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], "big")
+
+    def get(self, key):
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+def shard_key(update):
+    """Ключ розподілу: id автора оновлення, а для оновлень без автора — update_id"""
+    try:
+        user = getattr(update.event, "from_user", None)
+    except Exception:
+        user = None
+    return user.id if user else update.update_id
+
+
+def _worker_main(index, updates, reports, metrics_interval, fake_session_latency):
+    # Сигнали обробляє супервізор: процес завершується, отримавши None з черги
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_worker(index, updates, reports, metrics_interval, fake_session_latency))
+
+
+async def _worker(index, updates, reports, metrics_interval, fake_session_latency):
+    import database
+    import http_client
+    from handlers import dp
+    from services import voice_pool, stt_backend, start_gemini_selection
+
+    if fake_session_latency is not None:
+        from fakes import FakeSession
+        bot.session = FakeSession(fake_session_latency)
+
+    loop = asyncio.get_running_loop()
+    await database.warm_exercise_cache()
+    await database.load_active_sessions()
+    await http_client.start()
+    instrumentation.setup(dp, bot)
+    profiling.setup(dp)
+    lag_monitor = asyncio.create_task(instrumentation.monitor_event_loop(LOOP_LAG_INTERVAL))
+    loop.run_in_executor(None, stt_backend.ensure_loaded)
+    start_gemini_selection()
+    reports.put((index, "ready", metrics.snapshot(buckets=True)))
+
+    tasks = set()
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="updates")
+    update_stats = metrics.latency("worker_update")
+
+    async def process(raw):
+        with update_stats.time():
+            try:
+                await dp.feed_raw_update(bot, raw)
+            except Exception as e:
+                metrics.incr("worker_errors")
+                print(f"[worker {index}] Помилка обробки оновлення {raw.get('update_id')}: {e}")
+
+    last_report = time.monotonic()
+    while True:
+        try:
+            raw = await loop.run_in_executor(reader, updates.get, True, metrics_interval)
+        except queue.Empty:
+            raw = False
+        if raw is None:
+            break
+        if raw:
+            metrics.incr("worker_updates")
+            task = asyncio.create_task(process(raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if time.monotonic() - last_report >= metrics_interval:
+            last_report = time.monotonic()
+            metrics.set_gauge("worker_in_flight", len(tasks))
+            reports.put((index, "metrics", metrics.snapshot(buckets=True)))
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await voice_pool.drain(VOICE_DRAIN_TIMEOUT)
+    await http_client.close()
+    await dp.storage.close()
+    await database.close()
+    await bot.session.close()
+    reader.shutdown(wait=False)
+    lag_monitor.cancel()
+    profiling.disable()
+    metrics.set_gauge("worker_in_flight", 0)
+    reports.put((index, "stopped", metrics.snapshot(buckets=True)))
+
+
+class WorkerPool:
+    """
+    Робочі процеси з окремою чергою оновлень у кожного. feed_update має ту саму сигнатуру,
+    що й Dispatcher.feed_update, тому пул можна передати у WebhookServer замість dispatcher
+    """
+
+    def __init__(self, workers, metrics_interval=WORKER_METRICS_INTERVAL, fake_session_latency=None):
+        self.workers = workers
+        self.metrics_interval = metrics_interval
+        self.fake_session_latency = fake_session_latency
+        self.ring = HashRing(range(workers))
+        # spawn: дочірні процеси не успадковують event loop, потоки та з'єднання батьківського процесу
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = []
+        self._processes = []
+        self._reports = None
+        self._reports_reader = None
+        self.routed = [0] * workers
+        self.worker_metrics = {}
+        self.worker_status = {}
+        self.restarts = [0] * workers
+        self._stopping = False
+
+    def _start_worker(self, index, updates):
+        process = self._context.Process(
+            target=_worker_main, name=f"worker-{index}",
+            args=(index, updates, self._reports, self.metrics_interval, self.fake_session_latency))
+        process.start()
+        self._queues[index] = updates
+        self._processes[index] = process
+        self.worker_status[index] = "starting"
+
+    def start(self):
+        self._reports = self._context.Queue()
+        self._queues = [None] * self.workers
+        self._processes = [None] * self.workers
+        for index in range(self.workers):
+            self._start_worker(index, self._context.Queue())
+        self._reports_reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reports")
+        self._reports_reader.submit(self._read_reports)
+        print(f"Запущено робочих процесів: {self.workers}")
+
+    def _read_reports(self):
+        while True:
+            report = self._reports.get()
+            if report is None:
+                return
+            index, status, snapshot = report
+            self.worker_status[index] = status
+            self.worker_metrics[index] = snapshot
+
+    @staticmethod
+    def _lost_updates(updates):
+        try:
+            return updates.qsize()
+        except NotImplementedError:
+            return -1
+
+    def restart_dead(self):
+        """
+        Перезапускає процеси, що завершилися не через stop(). Стару чергу процес міг залишити
+        заблокованою, тож новий процес отримує нову чергу: оновлення, що чекали в старій або
+        оброблялися в момент завершення, втрачаються і рахуються в worker_lost_updates.
+        Повертає індекси перезапущених процесів
+        """
+        restarted = []
+        for index, process in enumerate(self._processes):
+            if self._stopping or process.is_alive():
+                continue
+            old = self._queues[index]
+            lost = self._lost_updates(old)
+            old.close()
+            old.cancel_join_thread()
+            print(f"Процес {process.name} завершився з кодом {process.exitcode}, перезапускаємо "
+                  f"(втрачено оновлень у черзі: {lost if lost >= 0 else 'невідомо'})")
+            self.restarts[index] += 1
+            metrics.incr(metrics.labeled("worker_restarts", worker=index))
+            if lost > 0:
+                metrics.incr(metrics.labeled("worker_lost_updates", worker=index), lost)
+            self._start_worker(index, self._context.Queue())
+            restarted.append(index)
+        return restarted
+
+    async def watch(self, interval=WORKER_CHECK_INTERVAL):
+        """Періодично перевіряє, чи живі робочі процеси, і перезапускає завершені"""
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            self.restart_dead()
+
+    async def wait_ready(self, timeout=120):
+        deadline = time.monotonic() + timeout
+        while any(status == "starting" for status in self.worker_status.values()):
+            if time.monotonic() > deadline:
+                raise TimeoutError("Робочі процеси не запустилися вчасно")
+            await asyncio.sleep(0.05)
+
+    def dispatch_raw(self, raw, key):
+        index = self.ring.get(key)
+        self.routed[index] += 1
+        metrics.incr(metrics.labeled("routed_updates", worker=index))
+        self._queues[index].put(raw)
+
+    async def feed_update(self, bot, update):
+        self.dispatch_raw(update.model_dump(mode="json", by_alias=True, exclude_unset=True), shard_key(update))
+
+    def render_metrics(self):
+        """Метрики супервізора і останні знімки метрик кожного процесу з міткою worker"""
+        metrics.set_gauge("workers_alive", sum(process.is_alive() for process in self._processes))
+        sources = [(metrics.snapshot(buckets=True), "")]
+        for index, snapshot in sorted(self.worker_metrics.items()):
+            sources.append((snapshot, f'worker="{index}"'))
+        return metrics.render_prometheus(sources)
+
+    def stats(self):
+        return {
+            index: {
+                "pid": process.pid,
+                "alive": process.is_alive(),
+                "status": self.worker_status.get(index),
+                "routed": self.routed[index],
+                "restarts": self.restarts[index],
+                "metrics": self.worker_metrics.get(index, {}),
+            }
+            for index, process in enumerate(self._processes)
+        }
+
+    async def stop(self, timeout=WORKER_STOP_TIMEOUT):
+        """Надсилає процесам сигнал завершення, дочікується обробки їхніх черг і зупиняє їх"""
+        self._stopping = True
+        for updates in self._queues:
+            updates.put(None)
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                print(f"Процес {process.name} не завершився вчасно, зупиняємо")
+                process.terminate()
+                process.join()
+        self._reports.put(None)
+        self._reports_reader.shutdown(wait=True)
+
+
+async def poll_updates(bot, pool, allowed_updates, stop_event):
+    """Long polling у супервізорі: отримані оновлення лише розподіляються між процесами"""
+    offset = None
+    while not stop_event.is_set():
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, allowed_updates=allowed_updates)
+        except Exception as e:
+            print(f"Помилка отримання оновлень: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            await pool.feed_update(bot, update)
+            offset = update.update_id + 1
+
+
+async def supervise(workers):
+    from handlers import dp
+    from webhook import WebhookServer, require_secret
+
+    if RUN_MODE == "webhook":
+        require_secret(WEBHOOK_SECRET, WEBHOOK_ALLOW_INSECURE)
+
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    pool = WorkerPool(workers)
+    pool.start()
+    metrics_server = instrumentation.MetricsServer(pool.render_metrics)
+    lag_monitor = asyncio.create_task(instrumentation.monitor_event_loop(LOOP_LAG_INTERVAL))
+    watcher = asyncio.create_task(pool.watch())
+    try:
+        if METRICS_PORT:
+            await metrics_server.start(METRICS_HOST, METRICS_PORT)
+        await pool.wait_ready()
+        if RUN_MODE == "webhook":
+            server = WebhookServer(pool, bot, WEBHOOK_PATH, WEBHOOK_SECRET)
+            await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+            if WEBHOOK_URL:
+                await bot.set_webhook(WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET,
+                                      allowed_updates=dp.resolve_used_update_types(), drop_pending_updates=False)
+            await stop_event.wait()
+            await server.stop(WEBHOOK_SHUTDOWN_TIMEOUT)
+        else:
+            polling = asyncio.create_task(poll_updates(bot, pool, dp.resolve_used_update_types(), stop_event))
+            await stop_event.wait()
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+        print("\nЗупинка робочих процесів...")
+    finally:
+        watcher.cancel()
+        await pool.stop()
+        await metrics_server.stop()
+        lag_monitor.cancel()
+        await bot.session.close()
+        for index, worker in pool.stats().items():
+            counters = worker["metrics"].get("counters", {})
+            print(f"Процес {index}: отримано {worker['routed']}, оброблено {counters.get('worker_updates', 0)}")
+
+
+def run(workers):
+    asyncio.run(supervise(workers))
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# База і токен мають бути задані до імпорту config; робочі процеси супервізора успадковують їх
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tests_"), "test.db")
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ.setdefault("STT_BACKEND", "fake")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,37 @@
+import asyncio
+
+import database
+import rollups
+import utils
+
+
+def count_entries():
+    conn = database.connect()
+    count = conn.execute("SELECT COUNT(*) FROM exercise_entries").fetchone()[0]
+    mismatched = rollups.verify(conn)
+    conn.close()
+    return count, mismatched
+
+
+def test_bad_row_fails_only_its_own_submit():
+    async def scenario():
+        first = await database.start_session(1)
+        second = await database.start_session(2)
+        results = await asyncio.gather(
+            database.add_exercise_entry(1, first, "присідання", 10, None),
+            database.add_exercise_entry(2, second, None, 5, None),
+            database.add_exercise_entry(1, first, "віджимання", 15, None),
+            return_exceptions=True)
+        await database.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], Exception)
+    assert count_entries() == (2, [])
+
+
+def test_gemini_result_without_name_is_rejected():
+    assert utils.check_gemini_result("10", {"name": None, "reps": 10}) is None
+    assert utils.check_gemini_result("10", {"name": " ", "reps": 10}) is None
+    assert utils.check_gemini_result("присідання 10", {"name": "присідання", "reps": 10})
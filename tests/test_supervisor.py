@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+import metrics
+from fakes import fake_text_update
+from supervisor import WorkerPool
+
+
+def processed(pool, index):
+    return pool.worker_metrics.get(index, {}).get("counters", {}).get("worker_updates", 0)
+
+
+def test_dead_worker_is_restarted():
+    async def scenario():
+        pool = WorkerPool(1, metrics_interval=0.2, fake_session_latency=0.0)
+        pool.start()
+        try:
+            await pool.wait_ready()
+            process = pool._processes[0]
+            process.kill()
+            process.join()
+            # Оновлення для мертвого процесу не обробиться, але має бути пораховане як втрачене
+            pool.dispatch_raw(fake_text_update(1, 1, "/start"), 1)
+
+            assert pool.restart_dead() == [0]
+            assert pool._processes[0].is_alive() and pool.restarts == [1]
+            assert metrics.snapshot()["counters"][metrics.labeled("worker_lost_updates", worker=0)] == 1
+            await pool.wait_ready()
+            pool.dispatch_raw(fake_text_update(2, 1, "/start"), 1)
+            deadline = time.monotonic() + 60
+            while processed(pool, 0) < 1 and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            assert processed(pool, 0) == 1
+            assert pool.restart_dead() == []
+        finally:
+            await pool.stop(10)
+
+    asyncio.run(scenario())
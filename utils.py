@@ -1,11 +1,22 @@
+import asyncio
 import json
 import re
-from services import gemini_model
-
-def parse_exercise(text):
-    try:
-        if gemini_model:
-            prompt = f"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+import admission
+import metrics
+import profiling
+from batching import MicroBatcher
+from config import (GEMINI_TIMEOUT, GEMINI_MAX_CONCURRENCY, GEMINI_QUEUE_TIMEOUT, LOCAL_PARSE_THRESHOLD,
+                    GEMINI_BATCH_ENABLED, GEMINI_BATCH_WINDOW_MS, GEMINI_BATCH_MAX_SIZE,
+                    PARSE_CACHE_MEMORY_SIZE, PARSE_CACHE_TTL, PARSE_CACHE_MAX_ROWS)
+from parse_cache import NOT_EXERCISE, ParseCache, prompt_version
+import services
+
+PARSE_PROMPT = """
 Ти помічник для парсингу описів вправ. Текст може містити помилки розпізнавання мовлення.
 
 КРИТИЧНО ВАЖЛИВО: 
@@ -53,51 +64,228 @@ def parse_exercise(text):
 Поверни ЛИШЕ JSON, без додаткового тексту.
             """
 
-            response = gemini_model.generate_content(prompt)
-            response_text = response.text.strip()
+# Пакетний варіант: ті самі правила, але кілька пронумерованих повідомлень і JSON-масив у відповідь
+BATCH_PROMPT = PARSE_PROMPT.split('ВХІДНИЙ ТЕКСТ:')[0] + """ВХІДНІ ТЕКСТИ (кожен рядок — окреме повідомлення):
+{messages}
 
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
+Поверни ЛИШЕ JSON-масив без додаткового тексту: по одному об'єкту на кожне повідомлення, у тому ж порядку,
+з полем "i" — номером повідомлення. Наприклад: [{{"i": 1, "name": "присідання", "reps": 20, "weight": null}}, {{"i": 2, "error": "not_exercise"}}]
+            """
 
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
+parse_cache = ParseCache(prompt_version(PARSE_PROMPT + BATCH_PROMPT), PARSE_CACHE_MEMORY_SIZE, PARSE_CACHE_TTL,
+                         PARSE_CACHE_MAX_ROWS)
 
-            if json_start != -1 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-                result = json.loads(json_text)
+# Обмеження одночасних звернень до Gemini. Слот звільняється лише коли виклик у потоці завершився,
+# тож навіть після тайм-ауту кількість реальних запитів не перевищує GEMINI_MAX_CONCURRENCY
+_gemini_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+_gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
 
-                if result.get('error') == 'not_exercise':
-                    print(f"Gemini визначив що '{text}' не є вправою")
-                    return None
 
-                if 'name' in result and 'reps' in result and isinstance(result['reps'], int):
-                    print(f"Gemini успішно розпарсив: '{text}' → {result}")
-                    return result
-                else:
-                    print(f"Gemini повернув некоректний JSON: {result}")
-            else:
-                print(f"Не знайдено JSON у відповіді Gemini: {response_text}")
+def build_prompt(text):
+    return PARSE_PROMPT.format(text=text)
+
+
+def build_batch_prompt(texts):
+    messages = "\n".join(f'{i}. "{text}"' for i, text in enumerate(texts, 1))
+    return BATCH_PROMPT.format(messages=messages)
+
+
+def parse_gemini_response(text, response_text):
+    """Розбирає відповідь Gemini: повертає dict вправи, NOT_EXERCISE або None при некоректній відповіді"""
+    response_text = response_text.strip()
+    response_text = response_text.replace('```json', '').replace('```', '').strip()
+
+    json_start = response_text.find('{')
+    json_end = response_text.rfind('}') + 1
+
+    if json_start == -1 or json_end <= json_start:
+        print(f"Не знайдено JSON у відповіді Gemini: {response_text}")
+        return None
+
+    return check_gemini_result(text, json.loads(response_text[json_start:json_end]))
+
+
+def parse_gemini_batch_response(texts, response_text):
+    """Розбирає JSON-масив пакетної відповіді. Для елементів, що відсутні чи некоректні, повертає None"""
+    response_text = response_text.replace('```json', '').replace('```', '').strip()
+    json_start = response_text.find('[')
+    json_end = response_text.rfind(']') + 1
+    if json_start == -1 or json_end <= json_start:
+        print(f"Не знайдено JSON-масиву у відповіді Gemini: {response_text}")
+        return [None] * len(texts)
+
+    items = json.loads(response_text[json_start:json_end])
+    by_index = {}
+    for position, item in enumerate(items, 1):
+        if isinstance(item, dict):
+            by_index[item.pop('i', position)] = item
+
+    results = []
+    for i, text in enumerate(texts, 1):
+        item = by_index.get(i)
+        try:
+            results.append(check_gemini_result(text, item) if item is not None else None)
+        except Exception as e:
+            print(f"Некоректний елемент пакетної відповіді Gemini для '{text}': {e}")
+            results.append(None)
+    return results
+
+
+def check_gemini_result(text, result):
+    """Перевіряє розібраний JSON від Gemini: dict вправи, NOT_EXERCISE або None"""
+    if result.get('error') == NOT_EXERCISE:
+        print(f"Gemini визначив що '{text}' не є вправою")
+        return NOT_EXERCISE
+
+    name = result.get('name')
+    if isinstance(name, str) and name.strip() and isinstance(result.get('reps'), int):
+        print(f"Gemini успішно розпарсив: '{text}' → {result}")
+        return result
+
+    print(f"Gemini повернув некоректний JSON: {result}")
+    return None
+
+
+async def call_gemini(model, prompt):
+    """
+    Викликає model.generate_content у окремому потоці з обмеженням паралельності та тайм-аутом.
+    Повертає текст відповіді або None, якщо слот не звільнився вчасно чи вичерпано тайм-аут
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(_gemini_slots.acquire(), GEMINI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.incr("gemini_rejected")
+        print("Ліміт одночасних запитів до Gemini вичерпано")
+        return None
+    metrics.latency("gemini_queue_wait").observe(time.perf_counter() - started)
+
+    loop = asyncio.get_running_loop()
+
+    def release(_):
+        try:
+            loop.call_soon_threadsafe(_gemini_slots.release)
+        except RuntimeError:
+            pass
+
+    # Тайм-аут передається і в сам запит: інакше після wait_for потік лишається зайнятим до відповіді
+    future = _gemini_executor.submit(model.generate_content, prompt, request_options={"timeout": GEMINI_TIMEOUT})
+    future.add_done_callback(release)
+
+    started = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(asyncio.wrap_future(future), GEMINI_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.incr("gemini_timeouts")
+        print(f"Gemini не відповів за {GEMINI_TIMEOUT} с")
+        return None
+    finally:
+        metrics.latency("gemini_call").observe(time.perf_counter() - started)
+    return response.text
+
+
+_batchers = {}
+
+
+def get_batcher(model):
+    """Окремий пакетувальник для кожної моделі"""
+    batcher = _batchers.get(id(model))
+    if batcher is None:
+        async def handle(texts):
+            response_text = await call_gemini(model, build_batch_prompt(texts))
+            if response_text is None:
+                return [None] * len(texts)
+            return parse_gemini_batch_response(texts, response_text)
+
+        batcher = _batchers[id(model)] = MicroBatcher(handle, GEMINI_BATCH_WINDOW_MS / 1000,
+                                                      GEMINI_BATCH_MAX_SIZE, name="gemini")
+    return batcher
+
+
+async def request_gemini_parse(model, text):
+    """Повертає dict вправи, NOT_EXERCISE або None, якщо Gemini не дав придатної відповіді"""
+    if GEMINI_BATCH_ENABLED:
+        return await get_batcher(model).submit(text)
+
+    response_text = await call_gemini(model, build_prompt(text))
+    if response_text is None:
+        return None
+    return parse_gemini_response(text, response_text)
+
+
+@profiling.staged("parse")
+async def parse_exercise(text, model=None):
+    # Спершу локальний парсинг: якщо він упевнений, звернення до Gemini не потрібне
+    local_result, confidence = score_local_parse(text)
+    if confidence >= LOCAL_PARSE_THRESHOLD:
+        metrics.incr("parse_local")
+        return local_result
+
+    model = model or await services.get_gemini_model(GEMINI_TIMEOUT)
+    if not model:
+        metrics.incr("parse_local")
+        return local_result
+
+    metrics.incr("parse_escalated")
+    try:
+        # Повторювані фрази беремо з кешу без звернення до Gemini
+        with metrics.latency("parse_cache_lookup").time():
+            cached = await parse_cache.get(text)
+        if cached is not None:
+            metrics.incr("parse_cache_hits")
+            return None if cached == NOT_EXERCISE else dict(cached)
+
+        # Під навантаженням або при надто частих запитах користувача — лише локальний парсинг
+        if not admission.try_acquire_llm():
+            metrics.incr("parse_local_forced")
+            return local_result
+        try:
+            result = await request_gemini_parse(model, text)
+        finally:
+            admission.llm.release()
+        if result:
+            metrics.incr("parse_gemini")
+            try:
+                await parse_cache.put(text, result)
+            except Exception as e:
+                # Кеш — лише оптимізація: збій запису (наприклад, база зайнята) не скасовує відповідь Gemini
+                metrics.incr("parse_cache_errors")
+                print(f"Не вдалося зберегти результат парсингу в кеш: {e}")
+        if result == NOT_EXERCISE:
+            return None
+        if result:
+            return result
 
     except Exception as e:
+        metrics.incr("gemini_errors")
         print(f"Помилка парсингу через Gemini: {e}")
-        if 'response' in locals():
-            print(f"Відповідь від Gemini: {response.text}")
 
     # Локальний парсинг як fallback
     print("Використовуємо локальний парсинг як резерв")
-    return smart_local_parse(text)
+    metrics.incr("parse_local_fallback")
+    return local_result
 
 
 def smart_local_parse(text):
     """Розумний локальний парсинг з збереженням повних назв вправ"""
+    return score_local_parse(text)[0]
+
+
+def score_local_parse(text):
+    """
+    Локальний парсинг з оцінкою впевненості від 0 до 1.
+    Повертає (результат або None, впевненість)
+    """
     try:
         text_lower = text.lower().strip()
         original_text = text.strip()
 
         if not re.search(r'\d+', text_lower):
-            return None
+            return None, 0.0
 
         reps = None
         weight = None
+        explicit_reps = False
 
         reps_patterns = [
             r'(\d+)\s*(?:повтор|раз|rep)',
@@ -105,10 +293,11 @@ def smart_local_parse(text):
             r'(\d+)\s*(?=\s|$)',
         ]
 
-        for pattern in reps_patterns:
+        for i, pattern in enumerate(reps_patterns):
             match = re.search(pattern, text_lower)
             if match:
                 reps = int(match.group(1))
+                explicit_reps = i < 2
                 break
 
         weight_patterns = [
@@ -124,93 +313,162 @@ def smart_local_parse(text):
                 break
 
         if not reps:
-            return None
+            return None, 0.0
 
-        exercise_name = extract_exercise_name(original_text, text_lower)
+        exercise_name, match_kind, rest = match_exercise_name(original_text, text_lower)
 
         if not exercise_name:
-            return None
+            return None, 0.0
 
-        return {
+        result = {
             "name": exercise_name,
             "reps": reps,
             "weight": weight
         }
 
+        # Явна назва з exercise_patterns надійніша за вікно слів навколо базової назви
+        confidence = 0.6 if match_kind in ("pattern", "corrected") else 0.3
+        # Число з "повторів"/"разів" надійніше за перше-ліпше число в тексті
+        confidence += 0.3 if explicit_reps else 0.1
+        if not explicit_reps and reps == weight:
+            # Число ваги сприйняте як кількість повторів
+            confidence = min(confidence, 0.2)
+        if match_kind == "corrected":
+            confidence -= 0.1
+        if unmatched_words(rest):
+            # Поруч із назвою лишились невідомі слова — можливо, це уточнення, якого шаблон не знає
+            confidence -= 0.2
+        return result, round(confidence, 2)
+
     except Exception as e:
         print(f"Помилка розумного локального парсингу: {e}")
-        return None
+        return None, 0.0
+
+
+FILLER_WORDS = {'зробив', 'зробила', 'зробили', 'виконав', 'виконала', 'ще', 'і', 'та', 'по',
+                'підхід', 'підходи', 'підходів', 'з', 'на', 'разом'}
+
+
+def unmatched_words(rest):
+    """Слова, що лишились поза назвою вправи, числами, повтореннями та вагою"""
+    if rest is None:
+        return []
+    rest = re.sub(r'\d+|повтор\w*|раз\w*|rep\w*|кг|з\s*вагою|вага', ' ', rest)
+    return [word for word in re.findall(r'\w+', rest) if word not in FILLER_WORDS]
 
 
 def extract_exercise_name(original_text, text_lower):
     """Витягує повну назву вправи зі збереженням деталей"""
+    return match_exercise_name(original_text, text_lower)[0]
+
+
+# Типові помилки розпізнавання мовлення
+CORRECTIONS = {
+    'приїде': 'присідання',
+    'приїду': 'присідання',
+    'приїдь': 'присідання',
+    'відтискань я': 'відтискання',
+    'відтискання я': 'відтискання',
+    'підтягуван я': 'підтягування',
+    'підтягув я': 'підтягування',
+    'планк а': 'планка',
+}
+
+# Порядок важливий: перший шаблон у списку, що знайдений будь-де в тексті, визначає назву
+EXERCISE_PATTERNS = [
+    (r'французьк\w*\s+жим(?:\s+лежачи)?', 'французький жим лежачи'),
+
+    (r'жим\s+штанги\s+лежачи', 'жим штанги лежачи'),
+    (r'жим\s+гантел[ьі]\s+лежачи', 'жим гантель лежачи'),
+    (r'жим\s+лежачи', 'жим лежачи'),
+    (r'жим\s+стоячи', 'жим стоячи'),
+    (r'жим(?:\s+від)?\s+грудей', 'жим від грудей'),
+
+    (r'присідання\s+з\s+штангою', 'присідання з штангою'),
+    (r'присідання\s+з\s+гантел[ьі]', 'присідання з гантеллю'),
+    (r'присідання', 'присідання'),
+
+    (r'підтягування\s+широким\s+хватом', 'підтягування широким хватом'),
+    (r'підтягування\s+вузьким\s+хватом', 'підтягування вузьким хватом'),
+    (r'підтягування\s+зворотним\s+хватом', 'підтягування зворотним хватом'),
+    (r'підтягування', 'підтягування'),
+
+    (r'(?:відтискання|віджимання)\s+від\s+підлоги', 'відтискання від підлоги'),
+    (r'(?:відтискання|віджимання)\s+на\s+брусах', 'відтискання на брусах'),
+    (r'(?:відтискання|віджимання)', 'відтискання'),
+
+    (r'планка\s+на\s+ліктях', 'планка на ліктях'),
+    (r'планка\s+на\s+руках', 'планка на руках'),
+    (r'планка', 'планка'),
+
+    (r'тяга\s+штанги\s+в\s+нахилі', 'тяга штанги в нахилі'),
+    (r'тяга\s+гантел[ьі]\s+в\s+нахилі', 'тяга гантель в нахилі'),
+    (r'тяга\s+верхнього\s+блоку', 'тяга верхнього блоку'),
+
+    (r'махи\s+гантел[ьі]', 'махи гантелями'),
+    (r'розведення\s+гантел[ьі]\s+лежачи', 'розведення гантель лежачи'),
+    (r'розведення\s+гантел[ьі]', 'розведення гантель'),
+
+    (r'випади\s+з\s+гантел[ьі]', 'випади з гантелями'),
+    (r'випади', 'випади'),
+    (r'скручування', 'скручування'),
+]
+
+BASIC_EXERCISES = ['жим', 'присідання', 'підтягування', 'відтискання', 'віджимання', 'планка', 'тяга']
+
+
+def _pattern_heads(pattern):
+    """Початкові слова шаблону: 'жим\\s+лежачи' → ['жим'], '(?:відтискання|віджимання)...' → обидва"""
+    match = re.match(r"\(\?:([^)]*)\)|[^\\(\[]+", pattern)
+    return match.group(1).split('|') if match.group(1) else [match.group(0)]
+
+
+def _compile_matcher():
+    groups = {}
+    for index, (pattern, name) in enumerate(EXERCISE_PATTERNS):
+        compiled = re.compile(pattern)
+        for head in _pattern_heads(pattern):
+            groups.setdefault(head, []).append((index, compiled, name))
+    heads = sorted(groups, key=len, reverse=True)
+    return re.compile('|'.join(map(re.escape, heads))), groups
+
+
+_CORRECTIONS_RE = re.compile('|'.join(map(re.escape, sorted(CORRECTIONS, key=len, reverse=True))))
+_HEADS_RE, _PATTERN_GROUPS = _compile_matcher()
+_CLEAN_NAME_RE = re.compile(r'\d+|повтор\w*|раз\w*|кг|з\s*вагою')
+_SPACES_RE = re.compile(r'\s+')
+
 
-    corrections = {
-        'приїде': 'присідання',
-        'приїду': 'присідання',
-        'приїдь': 'присідання',
-        'відтискань я': 'відтискання',
-        'відтискання я': 'відтискання',
-        'підтягуван я': 'підтягування',
-        'підтягув я': 'підтягування',
-        'планк а': 'планка',
-    }
-
-    corrected_text = text_lower
-    for wrong, correct in corrections.items():
-        if wrong in corrected_text:
-            corrected_text = corrected_text.replace(wrong, correct)
-
-    exercise_patterns = [
-        (r'французьк\w*\s+жим(?:\s+лежачи)?', 'французький жим лежачи'),
-
-        (r'жим\s+штанги\s+лежачи', 'жим штанги лежачи'),
-        (r'жим\s+гантел[ьі]\s+лежачи', 'жим гантель лежачи'),
-        (r'жим\s+лежачи', 'жим лежачи'),
-        (r'жим\s+стоячи', 'жим стоячи'),
-        (r'жим(?:\s+від)?\s+грудей', 'жим від грудей'),
-
-        (r'присідання\s+з\s+штангою', 'присідання з штангою'),
-        (r'присідання\s+з\s+гантел[ьі]', 'присідання з гантеллю'),
-        (r'присідання', 'присідання'),
-
-        (r'підтягування\s+широким\s+хватом', 'підтягування широким хватом'),
-        (r'підтягування\s+вузьким\s+хватом', 'підтягування вузьким хватом'),
-        (r'підтягування\s+зворотним\s+хватом', 'підтягування зворотним хватом'),
-        (r'підтягування', 'підтягування'),
-
-        (r'(?:відтискання|віджимання)\s+від\s+підлоги', 'відтискання від підлоги'),
-        (r'(?:відтискання|віджимання)\s+на\s+брусах', 'відтискання на брусах'),
-        (r'(?:відтискання|віджимання)', 'відтискання'),
-
-        (r'планка\s+на\s+ліктях', 'планка на ліктях'),
-        (r'планка\s+на\s+руках', 'планка на руках'),
-        (r'планка', 'планка'),
-
-        (r'тяга\s+штанги\s+в\s+нахилі', 'тяга штанги в нахилі'),
-        (r'тяга\s+гантел[ьі]\s+в\s+нахилі', 'тяга гантель в нахилі'),
-        (r'тяга\s+верхнього\s+блоку', 'тяга верхнього блоку'),
-
-        (r'махи\s+гантел[ьі]', 'махи гантелями'),
-        (r'розведення\s+гантел[ьі]\s+лежачи', 'розведення гантель лежачи'),
-        (r'розведення\s+гантел[ьі]', 'розведення гантель'),
-
-        (r'випади\s+з\s+гантел[ьі]', 'випади з гантелями'),
-        (r'випади', 'випади'),
-        (r'скручування', 'скручування'),
-    ]
-
-    for pattern, name in exercise_patterns:
-        if re.search(pattern, corrected_text):
-            return name
-
-    basic_exercises = ['жим', 'присідання', 'підтягування', 'відтискання', 'віджимання', 'планка', 'тяга']
-
-    for exercise in basic_exercises:
+def match_exercise_name(original_text, text_lower):
+    """
+    Повертає (назва, спосіб знаходження, решта тексту поза назвою). Спосіб: "pattern" — явний шаблон,
+    "corrected" — шаблон після виправлення помилок розпізнавання, "basic" — вікно слів навколо базової назви.
+
+    Виправлення застосовуються одним проходом, а шаблони не перебираються по черзі: один прохід знаходить
+    у тексті початкові слова шаблонів і перевіряє лише шаблони, що з них починаються, у цій позиції
+    """
+    corrected_text = _CORRECTIONS_RE.sub(lambda m: CORRECTIONS[m.group(0)], text_lower)
+
+    best = None
+    for head in _HEADS_RE.finditer(corrected_text):
+        for index, compiled, name in _PATTERN_GROUPS[head.group(0)]:
+            if best is not None and index >= best[0]:
+                break
+            match = compiled.match(corrected_text, head.start())
+            if match:
+                best = (index, name, match)
+                break
+        if best is not None and best[0] == 0:
+            break
+
+    if best is not None:
+        _, name, match = best
+        rest = corrected_text[:match.start()] + ' ' + corrected_text[match.end():]
+        return name, ("pattern" if corrected_text == text_lower else "corrected"), rest
+
+    for exercise in BASIC_EXERCISES:
         if exercise in corrected_text:
             words = original_text.split()
-            exercise_words = []
-            found = False
 
             for i, word in enumerate(words):
                 if exercise in word.lower():
@@ -218,63 +476,83 @@ def extract_exercise_name(original_text, text_lower):
                     end_idx = min(len(words), i + 3)
                     potential_name = ' '.join(words[start_idx:end_idx])
 
-                    clean_name = re.sub(r'\d+|повтор\w*|раз\w*|кг|з\s*вагою', '', potential_name).strip()
-                    clean_name = re.sub(r'\s+', ' ', clean_name)
+                    clean_name = _CLEAN_NAME_RE.sub('', potential_name).strip()
+                    clean_name = _SPACES_RE.sub(' ', clean_name)
 
                     if len(clean_name) > len(exercise):
-                        return clean_name
+                        return clean_name, "basic", None
                     else:
-                        return exercise
-
-    return None
+                        return exercise, "basic", None
 
+    return None, None, None
 
-def format_exercise_summary(exercises_raw):
-    """
-    Приймає список вправ з БД та форматує їх з групуванням за вагою
-    exercises_raw: список кортежів (name, reps, weight) з БД
-    """
-    exercise_groups = {}
 
-    for name, reps, weight in exercises_raw:
-        if name not in exercise_groups:
-            exercise_groups[name] = []
+# Максимальна довжина текстового повідомлення Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
 
-        exercise_groups[name].append({
-            'reps': reps,
-            'weight': weight
-        })
 
+def format_exercise_summary(summary_rows):
+    """
+    Форматує записи сесії, вже згруповані в SQL (database.SESSION_SUMMARY_SQL)
+    summary_rows: кортежі (name, weight, sets, reps), впорядковані за назвою та вагою за спаданням;
+    вага без значення подається як 0
+    """
     formatted_lines = []
 
-    for exercise_name, entries in exercise_groups.items():
-        if len(entries) == 1:
-            entry = entries[0]
-            line = f"• {exercise_name} – {entry['reps']} повторів"
-            if entry['weight']:
-                line += f" з вагою {entry['weight']:.0f} кг"
-        else:
-            weight_groups = {}
-            total_reps = 0
-
-            for entry in entries:
-                weight_key = entry['weight'] if entry['weight'] else 0
-                if weight_key not in weight_groups:
-                    weight_groups[weight_key] = 0
-                weight_groups[weight_key] += entry['reps']
-                total_reps += entry['reps']
+    for exercise_name, rows in groupby(summary_rows, key=itemgetter(0)):
+        rows = list(rows)
+        approaches_count = sum(row[2] for row in rows)
 
-            approaches_count = len(entries)
-            line = f"• {exercise_name} – {approaches_count} підходи, {total_reps} повторів:\n"
+        if approaches_count == 1:
+            _, weight, _, reps = rows[0]
+            line = f"• {exercise_name} – {reps} повторів"
+            if weight:
+                line += f" з вагою {weight:.0f} кг"
+        else:
+            total_reps = sum(row[3] for row in rows)
+            line = f"• {exercise_name} – {approaches_count} підходи, {total_reps} повторів:"
 
-            for weight, reps in sorted(weight_groups.items(), key=lambda x: x[0] or 0, reverse=True):
+            for _, weight, _, reps in rows:
                 if weight > 0:
-                    line += f"  - {reps} повторів з вагою {weight:.0f} кг\n"
+                    line += f"\n  - {reps} повторів з вагою {weight:.0f} кг"
                 else:
-                    line += f"  - {reps} повторів без ваги\n"
-
-            line = line.rstrip('\n')
+                    line += f"\n  - {reps} повторів без ваги"
 
         formatted_lines.append(line)
 
-    return formatted_lines
\ No newline at end of file
+    return formatted_lines
+
+
+def split_message(header, lines, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Збирає заголовок і рядки в повідомлення не довші за limit символів.
+    Рядки не розриваються між повідомленнями, якщо кожен окремо вміщується в ліміт
+    """
+    chunks = []
+    current = header.rstrip("\n")
+
+    for line in lines:
+        pieces = [line] if len(line) <= limit else _split_long_line(line, limit)
+        for piece in pieces:
+            if not current:
+                current = piece
+            elif len(current) + 1 + len(piece) <= limit:
+                current += "\n" + piece
+            else:
+                chunks.append(current)
+                current = piece
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_long_line(line, limit):
+    # Багаторядковий підсумок вправи ділиться за рядками, задовгий рядок — жорстко за лімітом
+    pieces = []
+    for part in line.split("\n"):
+        while len(part) > limit:
+            pieces.append(part[:limit])
+            part = part[limit:]
+        pieces.append(part)
+    return pieces
@@ -0,0 +1,127 @@
+import asyncio
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from config import FFMPEG_BINARY, VOICE_MAX_DURATION, VOICE_SAMPLE_RATE
+
+SAMPLE_WIDTH = 2
+
+
+class VoiceQueueFull(Exception):
+    """Черга голосових повідомлень заповнена або пул зупиняється"""
+
+
+def decode_ogg(data):
+    """
+    Декодує OGG/Opus з пам'яті одразу в моно 16-бітний PCM через ffmpeg (stdin → stdout), без тимчасових
+    файлів. Аудіо довше за VOICE_MAX_DURATION обрізається. Повертає (frame_data, sample_rate, sample_width)
+    """
+    command = [FFMPEG_BINARY, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+               "-t", str(VOICE_MAX_DURATION), "-f", "s16le", "-acodec", "pcm_s16le",
+               "-ac", "1", "-ar", str(VOICE_SAMPLE_RATE), "pipe:1"]
+    result = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg не зміг декодувати аудіо: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout, VOICE_SAMPLE_RATE, SAMPLE_WIDTH
+
+
+class VoicePool:
+    """
+    Пул обробки голосових повідомлень поза event loop: декодування (ffmpeg в окремому процесі, потік пулу
+    лише чекає на нього) і розпізнавання (мережеві виклики) у потоках. Черга обмежена — при переповненні
+    submit одразу кидає VoiceQueueFull замість того, щоб накопичувати роботу.
+    recognize — корутина recognize(frame_data, sample_rate, sample_width, user_id=..., run=...),
+    де run виконує блокуючі виклики в потоках пулу. decode — блокуюча функція (виконується в потоках),
+    що перетворює байти OGG на (frame_data, sample_rate, sample_width)
+    """
+
+    def __init__(self, recognize, queue_size, workers, decode_threads, recognize_threads, decode=decode_ogg):
+        self.recognize = recognize
+        self.decode = decode
+        self.queue_size = queue_size
+        self.workers = workers
+        self.decode_threads = decode_threads
+        self.recognize_threads = recognize_threads
+        self._queue = None
+        self._tasks = []
+        self._decode_executor = None
+        self._recognize_executor = None
+        self._closing = False
+
+    def _start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._decode_executor = ThreadPoolExecutor(max_workers=self.decode_threads,
+                                                   thread_name_prefix="decode")
+        self._recognize_executor = ThreadPoolExecutor(max_workers=self.recognize_threads,
+                                                      thread_name_prefix="stt")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, data, user_id=None):
+        """Ставить аудіо (байти OGG) у чергу та чекає на розпізнаний текст (або None)"""
+        if self._closing:
+            raise VoiceQueueFull("пул голосових повідомлень зупиняється")
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((data, user_id, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            metrics.incr("voice_rejected")
+            raise VoiceQueueFull("черга голосових повідомлень заповнена")
+        return await future
+
+    async def run_blocking(self, func, *args):
+        """Виконує блокуючий виклик розпізнавача в потоці пулу"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._recognize_executor, func, *args)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            data, user_id, future, queued_at = await self._queue.get()
+            try:
+                metrics.latency("voice_queue_wait").observe(time.perf_counter() - queued_at)
+
+                with metrics.latency("voice_decode").time():
+                    pcm = await loop.run_in_executor(self._decode_executor, self.decode, data)
+
+                with metrics.latency("voice_recognize").time():
+                    text = await self.recognize(*pcm, user_id=user_id, run=self.run_blocking)
+
+                if not future.done():
+                    future.set_result(text)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def drain(self, timeout):
+        """Припиняє прийом нових повідомлень і чекає завершення вже прийнятих (не довше timeout)"""
+        self._closing = True
+        if self._queue is None:
+            return
+        print(f"Очікуємо завершення обробки голосових повідомлень: {self._queue.qsize()} у черзі")
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print("Не всі голосові повідомлення встигли обробитися до зупинки")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._decode_executor.shutdown(wait=False, cancel_futures=True)
+        self._recognize_executor.shutdown(wait=False, cancel_futures=True)
+        self._queue = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "rejected": metrics.counter("voice_rejected"),
+            "queue_wait": metrics.latency("voice_queue_wait").snapshot(),
+            "decode": metrics.latency("voice_decode").snapshot(),
+            "recognize": metrics.latency("voice_recognize").snapshot(),
+        }
@@ -0,0 +1,125 @@
+"""
+Режим webhook: вбудований aiohttp-сервер приймає оновлення від Telegram і передає їх у dispatcher.
+
+Локальна перевірка (WEBHOOK_URL порожній — set_webhook не викликається):
+
+    RUN_MODE=webhook WEBHOOK_SECRET=s python main.py
+    curl -H 'X-Telegram-Bot-Api-Secret-Token: s' -d @update.json localhost:8080/webhook
+    curl localhost:8080/health
+
+Без WEBHOOK_SECRET режим webhook не запускається (крім WEBHOOK_ALLOW_INSECURE=1)
+
+Тіла оновлень для тестів будує fakes.fake_text_update / fakes.fake_voice_update
+"""
+import asyncio
+import hmac
+import time
+
+from aiogram.types import Update
+from aiohttp import web
+
+import metrics
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def require_secret(secret, allow_insecure=False):
+    """Без секрету сервер прийняв би підроблені оновлення від будь-кого, хто може дістатися порту"""
+    if secret:
+        return
+    if not allow_insecure:
+        raise RuntimeError("Режим webhook потребує WEBHOOK_SECRET "
+                           "(для локального запуску без перевірки задайте WEBHOOK_ALLOW_INSECURE=1)")
+    print("Увага: WEBHOOK_SECRET не задано, оновлення приймаються без перевірки (WEBHOOK_ALLOW_INSECURE)")
+
+
+class WebhookServer:
+    """
+    Приймає POST з оновленням, одразу відповідає 200 і обробляє оновлення у фоновій задачі,
+    щоб Telegram не чекав на обробник. При зупинці перестає приймати нові оновлення
+    і дочікується тих, що вже обробляються
+    """
+
+    def __init__(self, dispatcher, bot, path, secret=None):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.port = None
+        self._runner = None
+        self._tasks = set()
+        self._stopping = False
+        self._started_at = None
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get("/health", self._health)
+        return app
+
+    def _check_secret(self, request):
+        if not self.secret:
+            return True
+        return hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret)
+
+    async def _handle_update(self, request):
+        if not self._check_secret(request):
+            metrics.incr("webhook_unauthorized")
+            return web.Response(status=401)
+        if self._stopping:
+            # Telegram повторить доставку після перезапуску
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError as e:
+            metrics.incr("webhook_bad_requests")
+            print(f"Некоректне оновлення webhook: {e}")
+            return web.Response(status=400)
+
+        metrics.incr("webhook_updates")
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update):
+        try:
+            with metrics.latency("webhook_update").time():
+                await self.dispatcher.feed_update(self.bot, update)
+        except Exception as e:
+            metrics.incr("webhook_errors")
+            print(f"Помилка обробки оновлення {update.update_id}: {e}")
+
+    async def _health(self, request):
+        status = 503 if self._stopping else 200
+        return web.json_response({
+            "status": "stopping" if self._stopping else "ok",
+            "in_flight": len(self._tasks),
+            "updates": metrics.counter("webhook_updates"),
+            "uptime_seconds": round(time.monotonic() - self._started_at, 1),
+        }, status=status)
+
+    async def start(self, host, port):
+        self._runner = web.AppRunner(self.create_app(), handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._started_at = time.monotonic()
+        print(f"Webhook-сервер слухає {host}:{self.port}{self.path}")
+
+    async def stop(self, timeout):
+        """Перестає приймати оновлення, дочікується обробників (не довше timeout секунд) і зупиняє сервер"""
+        self._stopping = True
+        if self._tasks:
+            print(f"Очікування обробки {len(self._tasks)} оновлень...")
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                print(f"Не дочекалися {len(pending)} оновлень, скасовуємо")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None